@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import build
+import compile
+
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+
+def measure(path, directory, profile, options, input=None):
+    # Built from a copy, the generated files stay out of the repository
+    path = shutil.copy(path, directory)
+
+    translation = compile.translate(path, use_cache=False, dump_file=None, options=options)
+    compile.build_program(translation, profile, use_cache=False)
+
+    result = build.execute([os.path.abspath(translation["bin_file"])], input=input)
+    if not result.ok:
+        raise Exception("Failed to run %s, %s.\n%s" % (path, result.describe(), result.stderr))
+
+    return result
+
+def compare(name, naive, fast):
+    if naive.stdout != fast.stdout:
+        raise Exception("The outputs of %s differ:\n%s%s" % (name, naive.stdout, fast.stdout))
+
+    print("%s: %f seconds, then %f seconds (%.1f times faster)" % (name, naive.wall_time, fast.wall_time, naive.wall_time / max(fast.wall_time, 1e-6)))
+
+def run_builtins(directory, profile):
+    for naive in sorted(glob.glob(os.path.join(BENCHMARKS, "builtins", "*_naive.alg"))):
+        name = os.path.basename(naive)[:-len("_naive.alg")]
+        builtin = naive[:-len("_naive.alg")] + "_builtin.alg"
+
+        compare(name, measure(naive, directory, profile, {}), measure(builtin, directory, profile, {}))
+
+def run_fast_io(directory, profile, count):
+    # The same algorithm, read from iostream then from the fast I/O runtime
+    values = [str(random.randrange(1000000000)) for i in range(count)]
+    input = ("%d\n%s\n" % (count, "\n".join(values))).encode()
+    path = os.path.join(BENCHMARKS, "fast_io", "sum.alg")
+
+    compare("fast_io", measure(path, directory, profile, {}, input), measure(path, directory, profile, {"fast_io": True}, input))
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the naive algorithms of the benchmarks against the builtins and the fast I/O runtime.")
+    parser.add_argument("-p", "--profile", default="release", help="build profile (release by default)")
+    parser.add_argument("-n", "--count", type=int, default=10000000, help="number of integers read by the fast I/O benchmark (10M by default)")
+    args = parser.parse_args()
+
+    profile = build.find_profile(args.profile)
+
+    with tempfile.TemporaryDirectory() as directory:
+        run_builtins(directory, profile)
+        run_fast_io(directory, profile, args.count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import shlex
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+import configparser
+
+TIMEOUT = 300 # seconds
+
+# Compilers are tried in order, the first one installed is used
+PROFILES = {
+    "dev": {
+        "compilers": ["clang++", "g++", "c++"],
+        "c_compilers": ["tcc", "clang", "gcc", "cc"],
+        "flags": ["-O0", "-DALGOCOMPILE_BOUNDS_CHECK", "-DALGOCOMPILE_MEMO_STATS"]
+    },
+    "release": {
+        "compilers": ["g++", "clang++", "c++"],
+        "c_compilers": ["gcc", "clang", "cc"],
+        "flags": ["-O2", "-march=native", "-flto", "-s"]
+    }
+}
+
+def default_config_files():
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+
+    # Later files override earlier ones
+    return [os.path.join(base, "algocompile", "profiles.ini"), "algocompile.ini"]
+
+def load_profiles(files=None):
+    config = configparser.ConfigParser()
+    config.read(files if files is not None else default_config_files())
+
+    profiles = {name: dict(profile) for name, profile in PROFILES.items()}
+
+    for name in config.sections():
+        profile = profiles.setdefault(name, {"compilers": ["c++"], "c_compilers": ["cc"], "flags": []})
+
+        if "compilers" in config[name]:
+            profile["compilers"] = shlex.split(config[name]["compilers"])
+
+        if "c_compilers" in config[name]:
+            profile["c_compilers"] = shlex.split(config[name]["c_compilers"])
+
+        if "flags" in config[name]:
+            profile["flags"] = shlex.split(config[name]["flags"])
+
+    return profiles
+
+def find_profile(name, profiles=None):
+    profiles = profiles if profiles is not None else load_profiles()
+
+    if name not in profiles:
+        raise Exception("Unknown build profile %s (available: %s)" % (name, ", ".join(sorted(profiles))))
+
+    # Only needed by the C backend, which reports it missing when it is
+    c_compiler = next(filter(shutil.which, profiles[name]["c_compilers"]), None)
+
+    for compiler in profiles[name]["compilers"]:
+        if shutil.which(compiler):
+            return {"name": name, "compiler": compiler, "c_compiler": c_compiler, "c_compilers": profiles[name]["c_compilers"], "flags": profiles[name]["flags"]}
+
+    raise Exception("No compiler found for build profile %s (tried %s)" % (name, ", ".join(profiles[name]["compilers"])))
+
+class Result(object):
+
+    def __init__(self, command, returncode, stdout="", stderr="", wall_time=0, cpu_time=0, timed_out=False):
+        super().__init__()
+
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def describe(self):
+        if self.timed_out:
+            return "%s timed out after %f seconds" % (self.command[0], self.wall_time)
+
+        return "%s exited with code %d" % (self.command[0], self.returncode)
+
+def execute(command, input=None, timeout=None, capture=True):
+    # Captured in files rather than pipes, so that writing a large input can
+    # never deadlock against a child filling its output pipe
+    stdout = tempfile.TemporaryFile() if capture else None
+    stderr = tempfile.TemporaryFile() if capture else None
+
+    start = time.time()
+
+    try:
+        # Captured commands get their own process group, so that a timeout also
+        # kills what they spawned (e.g. cc1plus), while interactive ones keep the terminal
+        process = subprocess.Popen(command, stdin=subprocess.PIPE if input is not None else None, stdout=stdout, stderr=stderr, start_new_session=capture)
+    except OSError as e:
+        return Result(command, 127, stderr="%s\n" % e, wall_time=time.time() - start)
+
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+
+        try:
+            if capture:
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                os.kill(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    timer = threading.Timer(timeout, kill) if timeout is not None else None
+    if timer:
+        timer.start()
+
+    try:
+        if input is not None:
+            try:
+                process.stdin.write(input)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        # Reaped with wait4 rather than process.wait() to get the child's own
+        # CPU time, even when several children run at the same time
+        _, status, usage = os.wait4(process.pid, 0)
+    finally:
+        if timer:
+            timer.cancel()
+
+    process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+    end = time.time()
+
+    outputs = []
+    for output in (stdout, stderr):
+        if output is None:
+            outputs.append("")
+            continue
+
+        output.seek(0)
+        outputs.append(output.read().decode(errors="replace"))
+        output.close()
+
+    return Result(command, process.returncode, outputs[0], outputs[1], end - start, usage.ru_utime + usage.ru_stime, timed_out.is_set())
+
+def compile_source(source, bin_file, compiler, flags, timeout=TIMEOUT, header=None, language="c++"):
+    # Piped to the compiler, the generated source never has to be read back
+    # from disk. Quoted includes are then looked up from the current folder.
+    command = [compiler] + flags + ["-x", language]
+
+    if header:
+        command += ["-include", header]
+
+    return execute(command + ["-", "-o", bin_file], input=source.encode(), timeout=timeout)
+
+def precompile_header(header, compiler, flags, timeout=TIMEOUT):
+    # Named after the header, GCC and Clang then both pick it up with -include
+    return execute([compiler] + flags + ["-x", "c++-header", header, "-o", "%s.gch" % header], timeout=timeout)
+
+def run_binary(bin_file, timeout=None, capture=False):
+    return execute([os.path.abspath(bin_file)], timeout=timeout, capture=capture)
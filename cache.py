@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import hashlib
+import tempfile
+import subprocess
+
+import utils
+
+DEFAULT_MAX_SIZE = 256 # MiB
+
+def default_directory():
+    if os.environ.get("ALGOCOMPILE_CACHE"):
+        return os.environ["ALGOCOMPILE_CACHE"]
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+
+    return os.path.join(base, "algocompile")
+
+def default_max_size():
+    return int(os.environ.get("ALGOCOMPILE_CACHE_SIZE", DEFAULT_MAX_SIZE)) * 1024 * 1024
+
+def translator_version():
+    # Any change to the translator's own sources invalidates its translations,
+    # even when VERSION was not bumped
+    digest = hashlib.sha256(utils.VERSION.encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), "rb") as file:
+                digest.update(file.read())
+
+    return digest.hexdigest()
+
+def compiler_version(compiler):
+    try:
+        result = subprocess.run([compiler, "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return ""
+
+    return "%s\n%s" % (shutil.which(compiler), result.stdout.decode(errors="replace"))
+
+class Cache(object):
+
+    def __init__(self, directory=None, max_size=None):
+        super().__init__()
+
+        self.directory = directory or default_directory()
+        self.max_size = max_size if max_size is not None else default_max_size()
+
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts):
+        digest = hashlib.sha256()
+
+        for part in parts:
+            data = part.encode() if isinstance(part, str) else part
+
+            # Length-prefixed so that ("ab", "c") and ("a", "bc") differ
+            digest.update(b"%d:" % len(data))
+            digest.update(data)
+
+        return digest.hexdigest()
+
+    def path(self, key, name=None):
+        if name is None:
+            return os.path.join(self.directory, key)
+
+        return os.path.join(self.directory, key, name)
+
+    def get(self, key):
+        path = self.path(key)
+
+        if not os.path.isdir(path):
+            self.misses += 1
+            return None
+
+        # Entries are evicted least recently used first
+        os.utime(path)
+        self.hits += 1
+
+        return path
+
+    def read(self, key, name):
+        with open(self.path(key, name), "r") as file:
+            return file.read()
+
+    def put(self, key, contents=None, files=None):
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Filled aside then renamed, so that concurrent runs never see half an entry
+        tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+
+        for name, content in (contents or {}).items():
+            with open(os.path.join(tmp_path, name), "w") as file:
+                file.write(content)
+
+        for name, path in (files or {}).items():
+            shutil.copy2(path, os.path.join(tmp_path, name))
+
+        try:
+            os.rename(tmp_path, self.path(key))
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def evict(self):
+        # Scans the whole cache, meant to be called once per run rather than per put
+        if not os.path.isdir(self.directory):
+            return
+
+        entries = []
+        total_size = 0
+
+        for key in os.listdir(self.directory):
+            path = self.path(key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+
+            try:
+                size = sum(map(lambda x: os.path.getsize(os.path.join(path, x)), os.listdir(path)))
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+
+            total_size += size
+
+        entries.sort()
+
+        while entries and total_size > self.max_size:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
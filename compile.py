@@ -1,42 +1,89 @@
 #!/usr/bin/env python3
 
-import re
+import io
 import os
-import sys
+import glob
+import json
 import time
+import shutil
+import tempfile
+import argparse
+import itertools
+import threading
+import concurrent.futures
 
+import ir
+import build
+import cache
+import passes
+import emitter
 import parsers
 import outputs
 import utils
+import runtime
+import patterns
 
-def compile(file, out_c, out_h):
-    text = utils.strip_comments(file.read())
+PARSE_MODES = ["parse", "false", "0", "no", "n"]
+BUILD_MODES = ["build", "compile"]
+RUN_MODES = ["run", "true", "1", "yes", "y"]
+
+# Held while precompiling a header, see build_program()
+HEADER_LOCK = threading.Lock()
+
+# Translation options, set with a command line flag or "# algocompile: NAME"
+OPTIONS = ["fast_io"]
+
+def compile(file, out_c, out_h, dump_file="tmp", options=None, summaries=None):
+    source = utils.Source(*utils.strip_comments(file.read()), options)
+
+    program, stats = parse(source, dump_file)
+
+    # The summaries of other blocks' functions, see compile_blocks()
+    emit(source, program, out_c, out_h, dump_file, dict(summaries or {}, **stats["summaries"]))
+
+    return stats
+
+def parse(source, dump_file="tmp"):
+    text = source.text
+
+    # Parsers build the program, which is only emitted once all of it parsed
+    program = ir.Program()
+    declarations = outputs.ListOutput(program.declarations)
+
+    offset = 0
 
     try:
-        active_parsers = [parsers.FileParser(outputs.FileOutput(out_c), outputs.FileOutput(out_h))]
+        active_parsers = [parsers.FileParser(declarations, declarations)]
 
-        offset = 0
         stuck = False
 
+        stats = {"probes": 0, "avoided": 0, "features": source.features}
+
         while offset < len(text) and active_parsers:
-            active_parser = active_parsers[0]
+            active_parser = active_parsers[-1]
 
-            diff = active_parser.ends(text[offset:])
+            diff = active_parser.ends_at(source, offset)
             if diff >= 0:
                 offset += diff
-                active_parsers.pop(0)
+                active_parsers.pop()
                 stuck = False
                 continue
 
-            for child_class in active_parser.children():
-                diff, child = child_class.starts(text[offset:], active_parser)
+            children = active_parser.children()
+            candidates = parsers.dispatch(children, source.token(offset))
+
+            stats["probes"] += len(candidates)
+            stats["avoided"] += len(children) - len(candidates)
+
+            for child_class in candidates:
+                diff, child = child_class.starts_at(source, offset, active_parser)
                 if child is not None:
                     offset += diff
-                    active_parsers.insert(0, child)
+                    active_parsers.append(child)
                     stuck = False
                     break
             else:
-                diff = active_parser.parse(text[offset:])
+                diff = active_parser.parse_at(source, offset)
                 if diff > 0:
                     offset += diff
                 elif stuck:
@@ -48,93 +95,589 @@ def compile(file, out_c, out_h):
             raise Exception("Failed to parse.")
 
         while active_parsers:
-            diff = active_parsers[0].ends(text[offset:])
+            diff = active_parsers[-1].ends_at(source, offset)
             if diff >= 0:
                 offset += diff
-                active_parsers.pop(0)
+                active_parsers.pop()
                 continue
             else:
                 break
 
         if offset >= len(text) and active_parsers:
-            raise Exception("Reached end of file unexpectedly while in [%s]." % ", ".join(map(lambda x: x.__class__.__name__, active_parsers)))
+            raise Exception("Reached end of file unexpectedly while in [%s]." % ", ".join(map(lambda x: x.__class__.__name__, reversed(active_parsers))))
+
+        # What the functions change, cached along with a block's translation
+        stats["summaries"] = passes.summarize_program(program)
+
+        return program, stats
     except Exception as e:
-        tmp_file = "tmp"
-        if os.path.isfile("%s.alg" % tmp_file):
-            i = 0
-            while os.path.isfile("%s_%d.alg" % (tmp_file, i)):
-                i += 1
-            tmp_file = "%s_%d" % (tmp_file, i)
-
-        with open("%s.alg" % tmp_file, "w") as file:
-            file.write("# Generated with AlgoCompile\n")
-            file.write("#             by Aurélien Garnier\n")
-            file.write("#\n")
-            file.write("# Failed to compile the following file.\n")
-            file.write("# Comments and empty lines were stripped.\n")
-            file.write("#\n")
-            file.write("# %s\n" % str(e).replace("\\", "\\\\").replace("\n", "\\n"))
-            file.write("# Position: %d\n" % offset)
-            file.write(text)
+        dump(source, offset, dump_file, e)
+        raise e
 
+def emit(source, program, out_c, out_h, dump_file="tmp", summaries=None):
+    try:
+        program.effects = passes.resolve_effects(summaries or {})
+
+        for optimize in passes.PASSES:
+            program = optimize(program)
+
+        emitter.Emitter(source.options, source.features).emit(program, out_c, out_h)
+    except Exception as e:
+        dump(source, len(source.text), dump_file, e)
         raise e
 
-def main():
-    if len(sys.argv) <= 1:
-        print("Usage: %s <file> [parse/compile/run]" % sys.argv[0])
+def dump(source, offset, dump_file, e):
+    if dump_file is None:
         return
 
-    if len(sys.argv) >= 3 and not sys.argv[2].lower() in ["run", "true", "1", "yes", "y", "parse", "false", "0", "no", "n", "build", "compile"]:
-        print("Usage: %s <file> [parse/compile/run]" % sys.argv[0])
-        return
+    tmp_file = dump_file
+    if os.path.isfile("%s.alg" % tmp_file):
+        i = 0
+        while os.path.isfile("%s_%d.alg" % (tmp_file, i)):
+            i += 1
+        tmp_file = "%s_%d" % (tmp_file, i)
+
+    with open("%s.alg" % tmp_file, "w") as file:
+        file.write("# Generated with AlgoCompile\n")
+        file.write("#             by Aurélien Garnier\n")
+        file.write("#\n")
+        file.write("# Failed to compile the following file.\n")
+        file.write("# Comments and empty lines were stripped.\n")
+        file.write("#\n")
+        file.write("# %s\n" % str(e).replace("\\", "\\\\").replace("\n", "\\n"))
+        file.write("# Position: %d (line %d, column %d of the original file)\n" % ((offset,) + source.line_map.locate(offset)))
+        file.write(source.text)
+
+def split_blocks(text):
+    folded = utils.fold_case(text)
+
+    blocks = []
+    start = 0
+
+    for result in patterns.PATTERNS["block_end"].finditer(folded):
+        if result.group(1) is not None:
+            blocks.extend(split_global_variables(text, folded, start, result.end()))
+            start = result.end()
+
+    blocks.extend(split_global_variables(text, folded, start, len(text)))
+
+    return blocks
+
+def split_global_variables(text, folded, start, end):
+    blocks = []
+
+    result = patterns.PATTERNS["global_variables"].match(folded, start, end)
+    while result:
+        blocks.append(("var", text[result.start(1):result.end()]))
+        start = result.end()
+
+        result = patterns.PATTERNS["global_variables"].match(folded, start, end)
+
+    if text[start:end].strip():
+        blocks.append(("code", text[start:end]))
+
+    return blocks
+
+def compile_blocks(file, out_c, out_h, store, dump_file="tmp", options=None):
+    text = file.read()
+
+    # Every function, the main program and each VAR: section is self-contained,
+    # so they are translated and cached separately
+    blocks = split_blocks(utils.strip_comments(text)[0])
+
+    version = "%s:%s" % (cache.translator_version(), option_key(options))
+    global_variables = store.key(*[block for kind, block in blocks if kind == "var"])
+
+    stats = {"probes": 0, "avoided": 0, "features": set(), "blocks": len(blocks), "translated": 0}
+    fragments = []
+
+    # What each function changes decides how the others pass it arguments, so
+    # functions are summarized first, parsed blocks are then emitted as is
+    parsed = {}
+    summaries = {}
+
+    for i, (kind, block) in enumerate(blocks):
+        if kind == "var":
+            continue
+
+        key = store.key("summary", block, version)
+        if store.get(key):
+            summaries.update(json.loads(store.read(key, "block.summary")))
+            continue
+
+        source = utils.Source(*utils.strip_comments(block), options)
+
+        try:
+            parsed[i] = (source,) + parse(source, dump_file=None)
+        except Exception:
+            # Let the error be reported against the whole file instead
+            return compile(io.StringIO(text), out_c, out_h, dump_file=dump_file, options=options)
+
+        summaries.update(parsed[i][2]["summaries"])
+        store.put(key, contents={"block.summary": json.dumps(parsed[i][2]["summaries"], sort_keys=True)})
+
+    effects = passes.resolve_effects(summaries)
+    effects = store.key(json.dumps({name: [effect["changed"], sorted(effect["globals"]), effect["io"]] for name, effect in effects.items()}, sort_keys=True))
+
+    for i, (kind, block) in enumerate(blocks):
+        if kind == "var":
+            key = store.key(kind, block, version)
+        else:
+            # Functions may depend on the declared globals and on what the
+            # other functions change, not the other way around
+            key = store.key(kind, block, version, global_variables, effects)
+
+        if store.get(key):
+            fragments.append((store.read(key, "block.cpp"), store.read(key, "block.h")))
+            stats["features"].update(store.read(key, "block.features").split())
+            continue
+
+        block_c = io.StringIO()
+        block_h = io.StringIO()
+
+        try:
+            if i in parsed:
+                source, program, block_stats = parsed[i]
+            else:
+                source = utils.Source(*utils.strip_comments(block), options)
+                program, block_stats = parse(source, dump_file=None)
+
+            emit(source, program, block_c, block_h, dump_file=None, summaries=summaries)
+        except Exception:
+            return compile(io.StringIO(text), out_c, out_h, dump_file=dump_file, options=options)
+
+        stats["probes"] += block_stats["probes"]
+        stats["avoided"] += block_stats["avoided"]
+        stats["features"].update(block_stats["features"])
+        stats["translated"] += 1
+
+        fragments.append((block_c.getvalue(), block_h.getvalue()))
+        store.put(key, contents={"block.cpp": block_c.getvalue(), "block.h": block_h.getvalue(), "block.features": "\n".join(sorted(block_stats["features"]))})
+
+    for fragment_c, fragment_h in fragments:
+        out_c.write(fragment_c)
+        out_h.write(fragment_h)
+
+    return stats
+
+def option_key(options):
+    return ",".join(sorted("%s=%s" % (name, value) for name, value in (options or {}).items() if value))
+
+def find_options(text, options=None):
+    options = dict(options or {})
+
+    for name in patterns.PATTERNS["option"].findall(text):
+        name = name.lower().replace("-", "_")
+        if name not in OPTIONS:
+            raise Exception("Unknown option %s" % name)
+
+        options[name] = True
+
+    return options
+
+def find_algorithms(paths):
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                names = filter(patterns.PATTERNS["algorithm_file"].match, sorted(names))
+                files.extend(map(lambda x: os.path.join(root, x), itertools.filterfalse(patterns.PATTERNS["failure_dump"].match, names)))
+        elif any(map(lambda x: x in path, "*?[")):
+            names = filter(patterns.PATTERNS["algorithm_file"].match, sorted(glob.glob(path, recursive=True)))
+            files.extend(itertools.filterfalse(patterns.PATTERNS["failure_dump"].match, names))
+        else:
+            files.append(path)
+
+    # The same algorithm may be matched by several arguments
+    return list(dict.fromkeys(files))
+
+def translate_text(text, store, dump_file, options):
+    translation_key = store.key(text, cache.translator_version(), option_key(options)) if store else None
+    if store and store.get(translation_key):
+        body_c = store.read(translation_key, "program.cpp")
+        body_h = store.read(translation_key, "program.h")
+        features = set(store.read(translation_key, "program.features").split())
+        details = "cache hit"
+    else:
+        body_c = io.StringIO()
+        body_h = io.StringIO()
+        if store:
+            stats = compile_blocks(io.StringIO(text), body_c, body_h, store, dump_file=dump_file, options=options)
+        else:
+            stats = compile(io.StringIO(text), body_c, body_h, dump_file=dump_file, options=options)
+        body_c = body_c.getvalue()
+        body_h = body_h.getvalue()
+        features = stats["features"]
+        details = "%d of %d child probes avoided" % (stats["avoided"], stats["probes"] + stats["avoided"])
+
+        if "blocks" in stats:
+            details = "%d of %d blocks translated, %s" % (stats["translated"], stats["blocks"], details)
+
+        if store:
+            store.put(translation_key, contents={"program.cpp": body_c, "program.h": body_h, "program.features": "\n".join(sorted(features))})
+            details += ", cache miss"
+
+    return translation_key, body_c, body_h, features, details
+
+def translate(path, use_cache=True, dump_file="tmp", options=None):
+    store = cache.Cache() if use_cache else None
+
+    with open(path, "r") as file:
+        text = file.read()
+
+    start = time.time()
+    cpu_start = time.process_time()
+
+    options = find_options(text, options)
+
+    if utils.is_c(options):
+        try:
+            translation_key, body_c, body_h, features, details = translate_text(text, store, None, options)
+        except Exception as e:
+            # Any failure is retried in C++, which reports actual syntax errors
+            options = dict(options, backend="c++")
+            translation_key, body_c, body_h, features, details = translate_text(text, store, dump_file, options)
+            details += ", C backend failed (%s) so C++ was used" % str(e).rstrip(".")
+    else:
+        translation_key, body_c, body_h, features, details = translate_text(text, store, dump_file, options)
+
+    # Only what the algorithm uses, pure computations do not even need iostream
+    headers = utils.find_headers(features, options)
+    fast_io = options.get("fast_io") and "io" in features and not utils.is_c(options)
+
+    if fast_io:
+        # The fast I/O runtime replaces iostream
+        headers = sorted(set(utils.find_headers(features - set(["io"]), options) + runtime.FAST_IO_HEADERS))
+
+    bin_file = patterns.PATTERNS["algorithm_file"].sub(r"\1", path)
+    c_file = "%s.%s" % (bin_file, "c" if utils.is_c(options) else "cpp")
+    h_file = "%s.h" % bin_file
+
+    preamble_c = "// Generated with AlgoCompile\n"
+    preamble_c += "//             by Aurélien Garnier\n"
+    preamble_c += "\n"
+    preamble_c += "#include \"%s\"\n" % h_file
+    preamble_c += "\n"
 
-    if not os.path.isfile(sys.argv[1]):
-        print("Error: File does not exist at %s" % sys.argv[1])
+    preamble_h = "// Generated with AlgoCompile\n"
+    preamble_h += "//             by Aurélien Garnier\n"
+    preamble_h += "\n"
+    preamble_h += utils.write_includes(headers)
+
+    if fast_io:
+        preamble_h += "\n"
+        preamble_h += runtime.FAST_IO
+
+    for feature in sorted(features):
+        if feature in runtime.FEATURE_CODE and not utils.is_c(options):
+            preamble_h += "\n"
+            preamble_h += runtime.FEATURE_CODE[feature]
+
+    if headers:
+        preamble_h += "\n"
+
+    with open(c_file, "w") as out_c:
+        out_c.write(preamble_c)
+        out_c.write(body_c)
+
+    with open(h_file, "w") as out_h:
+        out_h.write(preamble_h)
+        out_h.write(body_h)
+
+    end = time.time()
+
+    return {
+        "file": path,
+        "bin_file": bin_file,
+        "c_file": c_file,
+        "backend": options.get("backend", "c++"),
+        "headers": headers,
+        # Handed to the compiler as is, diagnostics still point to the .cpp file
+        "source": "#line 1 \"%s\"\n%s%s" % (c_file, preamble_c, body_c),
+        "translation_key": translation_key,
+        "time": end - start,
+        "cpu_time": time.process_time() - cpu_start,
+        "details": details,
+        "hits": store.hits if store else 0,
+        "misses": store.misses if store else 0
+    }
+
+def precompile_header(store, profile, headers, timeout=build.TIMEOUT):
+    header = utils.write_includes(headers)
+
+    # The compiler's version is part of the key, a new compiler gets a new header
+    key = store.key("runtime.h", header, cache.compiler_version(profile["compiler"]), *profile["flags"])
+
+    result = None
+
+    if not store.get(key):
+        directory = tempfile.mkdtemp()
+
+        try:
+            with open(os.path.join(directory, "runtime.h"), "w") as file:
+                file.write(header)
+
+            result = build.precompile_header(os.path.join(directory, "runtime.h"), profile["compiler"], profile["flags"], timeout)
+
+            # Stored even on failure, so that an unsupported compiler is not retried on every run
+            files = {"runtime.h": os.path.join(directory, "runtime.h")}
+            if result.ok:
+                files["runtime.h.gch"] = os.path.join(directory, "runtime.h.gch")
+
+            store.put(key, files=files)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if not os.path.isfile(store.path(key, "runtime.h.gch")):
+        return None, result
+
+    return store.path(key, "runtime.h"), result
+
+def build_program(translation, profile, use_cache=True, timeout=build.TIMEOUT):
+    store = cache.Cache() if use_cache else None
+
+    start = time.time()
+
+    header = None
+
+    if translation["backend"] == "c":
+        if not profile["c_compiler"]:
+            raise Exception("No C compiler found for build profile %s (tried %s)" % (profile["name"], ", ".join(profile["c_compilers"])))
+
+        compiler = profile["c_compiler"]
+    else:
+        compiler = profile["compiler"]
+
+    binary_key = store.key(translation["translation_key"], cache.compiler_version(compiler), *profile["flags"]) if store else None
+    if store and store.get(binary_key):
+        shutil.copy2(store.path(binary_key, "program"), translation["bin_file"])
+        result = None
+        details = "%s profile with %s, cache hit" % (profile["name"], compiler)
+    else:
+        details = "%s profile with %s" % (profile["name"], compiler)
+
+        if store and translation["backend"] == "c++" and translation["headers"]:
+            # Algorithms of a batch mostly share the same headers, built only once
+            with HEADER_LOCK:
+                header, header_result = precompile_header(store, profile, translation["headers"], timeout)
+
+            if header_result and not header_result.ok:
+                details += ", failed to precompile the header as %s" % header_result.describe()
+            elif header_result:
+                details += " and a header precompiled in %f seconds" % header_result.wall_time
+            elif header:
+                details += " and a precompiled header"
+
+        result = build.compile_source(translation["source"], translation["bin_file"], compiler, profile["flags"], timeout, header, translation["backend"])
+        if not result.ok:
+            raise Exception("Failed to compile %s, %s.\n%s%s" % (translation["c_file"], result.describe(), result.stdout, result.stderr))
+
+        if store:
+            store.put(binary_key, files={"program": translation["bin_file"]})
+            details += ", cache miss"
+
+    end = time.time()
+
+    return {
+        "result": result,
+        "time": end - start,
+        "cpu_time": result.cpu_time if result else 0,
+        "details": details,
+        "hits": store.hits if store else 0,
+        "misses": store.misses if store else 0
+    }
+
+def run_program(translation, timeout=None):
+    result = build.run_binary(translation["bin_file"], timeout)
+
+    if result.timed_out:
+        print("Stopped after %f seconds (%f CPU seconds), the time limit was reached." % (result.wall_time, result.cpu_time))
+    else:
+        print("Exited with code %d in %f seconds (%f CPU seconds)." % (result.returncode, result.wall_time, result.cpu_time))
+
+    return result
+
+def describe_times(stage):
+    details = "%f CPU seconds" % stage["cpu_time"]
+
+    if stage["details"]:
+        details += ", %s" % stage["details"]
+
+    return "%f seconds (%s)" % (stage["time"], details)
+
+def main_single(path, mode, use_cache, timeout, profile, options):
+    if not os.path.isfile(path):
+        print("Error: File does not exist at %s" % path)
         return
 
-    if not os.access(sys.argv[1], os.R_OK):
-        print("Error: You don't have read permission for %s" % sys.argv[1])
+    if not os.access(path, os.R_OK):
+        print("Error: You don't have read permission for %s" % path)
         return
 
-    bin_file = re.sub(r"^(.*)\.alg$", r"\1", sys.argv[1])
-    c_file = "%s.cpp" % bin_file
-    h_file = "%s.h" % bin_file
+    translation = translate(path, use_cache, options=options)
 
-    with open(sys.argv[1], "r") as file:
-        with open(c_file, "w") as out_c:
-            with open(h_file, "w") as out_h:
-                start = time.time()
-
-                out_c.write("// Generated with AlgoCompile\n")
-                out_c.write("//             by Aurélien Garnier\n")
-                out_c.write("\n")
-                out_c.write("#include \"%s\"\n" % h_file)
-                out_c.write("\n")
-
-                out_h.write("// Generated with AlgoCompile\n")
-                out_h.write("//             by Aurélien Garnier\n")
-                out_h.write("\n")
-                out_h.write("#include <cmath>\n")
-                out_h.write("#include <string>\n")
-                out_h.write("#include <iostream>\n")
-                out_h.write("\n")
-
-                compile(file, out_c, out_h)
-
-                end = time.time()
-                print("Successfully parsed in %f seconds." % (end - start))
-
-    if len(sys.argv) >= 3 and sys.argv[2].lower() in ["run", "true", "1", "yes", "y", "build", "compile"]:
-        start = time.time()
-        if os.system("c++ %s -o %s" % (c_file, bin_file)) == 0:
-            end = time.time()
-            print("Successfully compiled in %f seconds." % (end - start))
-        else:
+    print("Successfully parsed in %s." % describe_times(translation))
+
+    hits = translation["hits"]
+    misses = translation["misses"]
+
+    if mode in BUILD_MODES + RUN_MODES:
+        try:
+            result = build_program(translation, profile, use_cache, timeout or build.TIMEOUT)
+        except Exception as e:
+            print("Error: %s" % e)
             return
 
-    if len(sys.argv) >= 3 and sys.argv[2].lower() in ["run", "true", "1", "yes", "y"]:
+        # Warnings only, errors were reported above
+        if result["result"] and result["result"].stderr:
+            print(result["result"].stderr, end="")
+
+        print("Successfully compiled in %s." % describe_times(result))
+
+        hits += result["hits"]
+        misses += result["misses"]
+
+    if use_cache:
+        store = cache.Cache()
+        store.evict()
+        print("Cache hits: %d, misses: %d (%s)." % (hits, misses, store.directory))
+
+    if mode in RUN_MODES:
         print("Running...")
-        os.system("./%s" % bin_file)
+        run_program(translation, timeout)
+
+def main_batch(paths, mode, use_cache, jobs, timeout, profile, options):
+    start = time.time()
+
+    results = {path: {"file": path} for path in paths}
+
+    # Translation is CPU-bound Python, hence processes, while builds only wait
+    # on c++, hence threads limited to the requested number of jobs
+    with concurrent.futures.ProcessPoolExecutor() as translators, concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as builders:
+        translations = {}
+        for path in paths:
+            if not os.path.isfile(path):
+                results[path]["error"] = "File does not exist at %s" % path
+                continue
+
+            if not os.access(path, os.R_OK):
+                results[path]["error"] = "You don't have read permission for %s" % path
+                continue
+
+            dump_file = "%s_failed" % patterns.PATTERNS["algorithm_file"].sub(r"\1", path)
+            translations[translators.submit(translate, path, use_cache, dump_file, options)] = path
+
+        builds = {}
+        for future in concurrent.futures.as_completed(translations):
+            path = translations[future]
+
+            try:
+                results[path]["translation"] = future.result()
+            except Exception as e:
+                results[path]["error"] = "Failed to parse: %s" % e
+                continue
+
+            if mode in BUILD_MODES + RUN_MODES:
+                builds[builders.submit(build_program, results[path]["translation"], profile, use_cache, timeout or build.TIMEOUT)] = path
+
+        for future in concurrent.futures.as_completed(builds):
+            path = builds[future]
+
+            try:
+                results[path]["build"] = future.result()
+            except Exception as e:
+                results[path]["error"] = str(e)
+
+    end = time.time()
+
+    parse_time = 0
+    build_time = 0
+    cpu_time = 0
+    hits = 0
+    misses = 0
+
+    for path in paths:
+        result = results[path]
+
+        if "translation" in result:
+            parse_time += result["translation"]["time"]
+            cpu_time += result["translation"]["cpu_time"]
+            hits += result["translation"]["hits"]
+            misses += result["translation"]["misses"]
+
+        if "build" in result:
+            build_time += result["build"]["time"]
+            cpu_time += result["build"]["cpu_time"]
+            hits += result["build"]["hits"]
+            misses += result["build"]["misses"]
+
+        if "error" in result:
+            print("%s: Error: %s" % (path, result["error"].rstrip("\n")))
+        elif "build" in result:
+            print("%s: parsed in %s, compiled in %s." % (path, describe_times(result["translation"]), describe_times(result["build"])))
+        else:
+            print("%s: parsed in %s." % (path, describe_times(result["translation"])))
+
+    failed = len(list(filter(lambda x: "error" in x, results.values())))
+
+    print("Processed %d files (%d failed) in %f seconds, %f seconds parsing, %f seconds compiling, and %f CPU seconds in total." % (len(paths), failed, end - start, parse_time, build_time, cpu_time))
+
+    if use_cache:
+        store = cache.Cache()
+        store.evict()
+        print("Cache hits: %d, misses: %d (%s)." % (hits, misses, store.directory))
+
+    if mode in RUN_MODES:
+        for path in paths:
+            if "error" not in results[path]:
+                print("Running %s..." % path)
+                run_program(results[path]["translation"], timeout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate algorithms to C++, then optionally compile and run them.")
+    parser.add_argument("files", nargs="+", metavar="file", help="path to an algorithm, a folder of algorithms, or a glob pattern")
+    parser.add_argument("mode", nargs="?", default="parse", metavar="parse/compile/run")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="maximum number of simultaneous compilations")
+    parser.add_argument("-p", "--profile", default="dev", help="build profile, either dev, release, or one defined in algocompile.ini (dev by default)")
+    parser.add_argument("-t", "--timeout", type=float, help="maximum number of seconds for each compilation and run (%d seconds per compilation by default, no limit per run)" % build.TIMEOUT)
+    parser.add_argument("-b", "--backend", default="c++", choices=["c++", "c"], help="language to translate to, C compiles faster but falls back to C++ for unsupported algorithms (C++ by default)")
+    parser.add_argument("--fast-io", action="store_true", help="use a buffered runtime for Read and Write instead of iostream, same as \"# algocompile: fast-io\" in the algorithm")
+    parser.add_argument("--no-cache", action="store_true", help="always translate and compile, without reading or updating the cache")
+    args = parser.parse_args()
+
+    # The mode is greedily taken as a file, unless a file by that name exists
+    mode = args.mode
+    if len(args.files) > 1 and args.files[-1].lower() in PARSE_MODES + BUILD_MODES + RUN_MODES and not os.path.exists(args.files[-1]):
+        mode = args.files.pop()
+
+    mode = mode.lower()
+    if mode not in PARSE_MODES + BUILD_MODES + RUN_MODES:
+        parser.error("invalid mode: '%s'" % mode)
+
+    if args.jobs < 1:
+        parser.error("invalid number of jobs: %d" % args.jobs)
+
+    if args.timeout is not None and args.timeout <= 0:
+        parser.error("invalid timeout: %f" % args.timeout)
+
+    profile = None
+    if mode in BUILD_MODES + RUN_MODES:
+        try:
+            profile = build.find_profile(args.profile)
+        except Exception as e:
+            print("Error: %s" % e)
+            return
+
+    files = find_algorithms(args.files)
+
+    if len(files) == 1 and files == args.files:
+        main_single(files[0], mode, not args.no_cache, args.timeout, profile, {"backend": args.backend, "fast_io": args.fast_io})
+    elif files:
+        main_batch(files, mode, not args.no_cache, args.jobs, args.timeout, profile, {"backend": args.backend, "fast_io": args.fast_io})
+    else:
+        print("Error: No algorithm found at %s" % ", ".join(args.files))
 
 if __name__ == "__main__":
     main()
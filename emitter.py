@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+
+import itertools
+
+import ir
+import utils
+import passes
+
+# Statements after which the rest of the block is never run
+JUMPS = (ir.Return, ir.Break, ir.Continue)
+
+class Emitter(object):
+
+    def __init__(self, options=None, features=None):
+        super().__init__()
+
+        self.options = options or {}
+        # Runtime features used by the emitted code, see utils.FEATURE_HEADERS
+        self.features = features if features is not None else set()
+
+        # Function being emitted, None in the main program
+        self.function = None
+        # What the algorithm's functions change, see passes.resolve_effects()
+        self.effects = {}
+        # Loops and switches around the current statement, innermost last,
+        # with the label a loop needs when a switch inside it breaks out
+        self.jumps = []
+        self.labels = itertools.count(1)
+
+        self.declarations = {
+            ir.Variables: self.emit_variables,
+            ir.Function: self.emit_function,
+            ir.MainFunction: self.emit_main_function
+        }
+
+        self.statements = {
+            ir.Assignment: self.emit_assignment,
+            ir.Call: self.emit_call_statement,
+            ir.If: self.emit_if,
+            ir.While: self.emit_while,
+            ir.DoWhile: self.emit_do_while,
+            ir.For: self.emit_for,
+            ir.Switch: self.emit_switch,
+            ir.Block: self.emit_block,
+            ir.Let: self.emit_let,
+            ir.Return: self.emit_return,
+            ir.Break: self.emit_break,
+            ir.Continue: self.emit_continue
+        }
+
+        self.expressions = {
+            ir.Binary: self.emit_binary,
+            ir.Unary: self.emit_unary,
+            ir.Name: lambda x, y: self.emit_name(x),
+            ir.Number: lambda x, y: x.text,
+            ir.String: lambda x, y: utils.translate_string(x.text),
+            ir.Call: lambda x, y: self.emit_call(x),
+            ir.Index: lambda x, y: self.emit_index(x)
+        }
+
+    def emit(self, program, out_c, out_h):
+        lines_c = []
+        lines_h = []
+
+        self.effects = program.effects
+
+        for declaration in program.declarations:
+            # Legacy parsers may still write raw text, which is kept as is
+            if isinstance(declaration, str):
+                lines_c.append(declaration)
+            else:
+                self.declarations[type(declaration)](declaration, lines_c, lines_h)
+
+        out_c.write("".join(lines_c))
+        out_h.write("".join(lines_h))
+
+    def line(self, lines, depth, text):
+        lines.append("%s\n" % utils.indent(depth, text))
+
+    def emit_variables(self, node, lines_c, lines_h):
+        self.line(lines_h, 0, utils.write_variables(node.names, node.var_type, self.options, self.features))
+
+    def emit_function(self, node, lines_c, lines_h):
+        return_type = utils.translate_type(node.return_type, self.options, self.features)
+        written = passes.written_names(node.body, self.effects)
+        parameters = utils.write_parameters([x[0] for x in node.parameters], [x[1] for x in node.parameters], node.changed, self.options, self.features, written)
+
+        name = node.name
+        if node.memoized is not None:
+            # The function's own body is renamed, its recursive calls go
+            # through the table too
+            name = "algocompile_uncached_%s" % node.name
+            self.emit_memoized(node, return_type, parameters, name, lines_c, lines_h)
+
+        self.line(lines_c, 0, "%s %s(%s) {" % (return_type, name, parameters))
+        self.line(lines_h, 0, "%s %s(%s);" % (return_type, name, parameters))
+
+        for copy in utils.write_copies([x[0] for x in node.parameters], [x[1] for x in node.parameters], node.changed, self.options, self.features, written):
+            self.line(lines_c, 1, copy)
+
+        for variables, var_type in node.local_variables:
+            self.line(lines_c, 1, utils.write_variables(variables, var_type, self.options, self.features, local=True))
+
+        self.function = node
+        self.body(node.body, lines_c, 1)
+        self.function = None
+
+        self.line(lines_c, 0, "}")
+
+    def emit_memoized(self, node, return_type, parameters, uncached, lines_c, lines_h):
+        if utils.is_c(self.options):
+            raise Exception("Memoized functions are not supported by the C backend.")
+
+        if not utils.type_name(node.return_type):
+            raise Exception("Memoized function \"%s\" has no return type." % node.name)
+
+        names = []
+        types = []
+        for variables, var_type in node.parameters:
+            for variable in variables:
+                variable, bounds = utils.split_array_name(variable)
+
+                if variable in node.changed or bounds or utils.split_array_type(var_type)[0]:
+                    raise Exception("Memoized function \"%s\" cannot change its parameter \"%s\"." % (node.name, variable))
+
+                names.append(variable)
+                types.append(var_type)
+
+        ranges = dict((x[0], x[1:]) for x in node.memoized)
+        for variable in ranges:
+            if variable not in names:
+                raise Exception("Memoized function \"%s\" has no parameter \"%s\"." % (node.name, variable))
+
+        self.features.add("memo")
+
+        arguments = ", ".join(names)
+        sizes = [ranges[x][1] - ranges[x][0] + 1 if x in ranges else 0 for x in names]
+        size = 1
+        for x in sizes:
+            size *= max(x, 0)
+
+        # Dense tables need every parameter to be an integer in a declared range
+        if names and all(sizes) and all(utils.type_name(x) == "integer" for x in types) and 0 < size <= utils.MEMO_DENSE_LIMIT:
+            lows = ", ".join(str(ranges[x][0]) for x in names)
+            table = "algocompile::dense_memo<%s, %d> algocompile_memo(\"%s\", {%s}, {%s});" % (return_type, len(names), node.name, lows, ", ".join(map(str, sizes)))
+        else:
+            key_types = ", ".join([return_type] + [utils.translate_type(x, self.options, self.features) for x in types])
+            table = "algocompile::memo<%s> algocompile_memo(\"%s\", %d);" % (key_types, node.name, utils.MEMO_CAPACITY)
+
+        self.line(lines_c, 0, "%s %s(%s) {" % (return_type, node.name, parameters))
+        self.line(lines_h, 0, "%s %s(%s);" % (return_type, node.name, parameters))
+
+        self.line(lines_c, 1, "static %s" % table)
+        self.line(lines_c, 1, "if (const %s *cached = algocompile_memo.find(%s)) {" % (return_type, arguments))
+        self.line(lines_c, 2, "return *cached;")
+        self.line(lines_c, 1, "}")
+        self.line(lines_c, 1, "return algocompile_memo.store(%s(%s)%s);" % (uncached, arguments, ", " + arguments if arguments else ""))
+        self.line(lines_c, 0, "}")
+
+    def emit_main_function(self, node, lines_c, lines_h):
+        if utils.is_c(self.options):
+            self.line(lines_c, 0, "int main(void) {")
+            self.line(lines_h, 0, "int main(void);")
+        else:
+            self.line(lines_c, 0, "int main(int argc, char *argv[]) {")
+            self.line(lines_h, 0, "int main(int argc, char *argv[]);")
+
+        self.body(node.body, lines_c, 1)
+        self.line(lines_c, 1, "return 0;")
+        self.line(lines_c, 0, "}")
+
+    def body(self, statements, lines, depth):
+        # Nested blocks are not emitted recursively: their statements, and the
+        # steps closing them, wait on a stack instead. Deep nesting would
+        # otherwise exceed the recursion limit.
+        work = list(reversed(self.nested(statements, depth)))
+
+        while work:
+            step = work.pop()
+
+            if callable(step):
+                step()
+                continue
+
+            statement, depth = step
+
+            if isinstance(statement, str):
+                lines.append(statement)
+                continue
+
+            steps = self.statements[type(statement)](statement, lines, depth)
+            if steps:
+                work.extend(reversed(steps))
+
+    def nested(self, statements, depth):
+        return [(statement, depth) for statement in statements]
+
+    def later(self, lines, depth, text):
+        return lambda: self.line(lines, depth, text)
+
+    def emit_assignment(self, node, lines, depth):
+        self.line(lines, depth, "%s = %s;" % (self.expression(node.target), self.expression(node.value)))
+
+    def emit_call_statement(self, node, lines, depth):
+        precedence = utils.argument_precedence(node.name, self.options)
+        arguments = [self.expression(argument, precedence) for argument in node.arguments]
+
+        self.line(lines, depth, utils.write_function(node.name, arguments, self.options, self.features))
+
+    def emit_if(self, node, lines, depth):
+        steps = []
+
+        for i, (condition, statements) in enumerate(node.branches):
+            steps.append(self.later(lines, depth, "%sif (%s) {" % ("} else " if i > 0 else "", self.expression(condition))))
+            steps += self.nested(statements, depth + 1)
+
+        if node.otherwise is not None:
+            steps.append(self.later(lines, depth, "} else {"))
+            steps += self.nested(node.otherwise, depth + 1)
+
+        steps.append(self.later(lines, depth, "}"))
+
+        return steps
+
+    def loop(self, lines, depth, header, statements, footer):
+        jump = ["loop", None]
+
+        def close():
+            self.jumps.pop()
+            self.line(lines, depth, footer)
+
+            # Where breaks from a switch inside the loop go
+            if jump[1] is not None:
+                self.line(lines, depth, "%s:;" % jump[1])
+
+        self.line(lines, depth, header)
+        self.jumps.append(jump)
+
+        return self.nested(statements, depth + 1) + [close]
+
+    def emit_while(self, node, lines, depth):
+        return self.loop(lines, depth, "while (%s) {" % self.expression(node.condition), node.body, "}")
+
+    def emit_do_while(self, node, lines, depth):
+        return self.loop(lines, depth, "do {", node.body, "} while (%s);" % self.expression(node.condition))
+
+    def emit_for(self, node, lines, depth):
+        start = self.expression(node.start)
+        end = self.expression(node.end, utils.PRECEDENCE["<="] + 1)
+        step = self.expression(node.step) if node.step is not None else "1"
+
+        ascending = "%s <= %s" % (node.variable, end)
+        descending = "%s >= %s" % (node.variable, end)
+
+        # The direction is only known at run time when the step is a variable
+        if node.step is None or type(node.step) is ir.Number:
+            condition = descending if step.startswith("-") else ascending
+        else:
+            condition = "%s > 0 ? %s : %s" % (self.expression(node.step, utils.PRECEDENCE[">"] + 1), ascending, descending)
+
+        if step == "1":
+            increment = "++%s" % node.variable
+        elif step == "-1":
+            increment = "--%s" % node.variable
+        else:
+            increment = "%s += %s" % (node.variable, step)
+
+        return self.loop(lines, depth, "for (%s = %s; %s; %s) {" % (node.variable, start, condition, increment), node.body, "}")
+
+    def emit_switch(self, node, lines, depth):
+        self.line(lines, depth, "switch (%s) {" % self.expression(node.value))
+
+        steps = []
+        for i, (value, statements) in enumerate(node.cases):
+            if value is None:
+                steps.append(self.later(lines, depth, "default:"))
+            else:
+                steps.append(self.later(lines, depth, "case %s:" % self.expression(value)))
+
+            steps.append(lambda: self.jumps.append(["switch", None]))
+            steps += self.nested(statements, depth + 1)
+            steps.append(self.jumps.pop)
+
+            # Cases never fall through, unless they already jump elsewhere
+            if i < len(node.cases) - 1 and not (statements and isinstance(statements[-1], JUMPS)):
+                steps.append(self.later(lines, depth + 1, "break;"))
+
+        steps.append(self.later(lines, depth, "}"))
+
+        return steps
+
+    def emit_block(self, node, lines, depth):
+        self.line(lines, depth, "{")
+
+        return self.nested(node.body, depth + 1) + [self.later(lines, depth, "}")]
+
+    def emit_let(self, node, lines, depth):
+        value = self.expression(node.value)
+
+        if utils.is_c(self.options):
+            self.line(lines, depth, "const int %s = %s;" % (node.name, value))
+        else:
+            self.line(lines, depth, "const auto %s = %s;" % (node.name, value))
+
+    def emit_return(self, node, lines, depth):
+        if self.function is None:
+            # Ends the main program, successfully unless told otherwise
+            value = self.expression(node.value) if node.value is not None else "0"
+            self.line(lines, depth, "return %s;" % value)
+        elif not utils.type_name(self.function.return_type):
+            if node.value is not None:
+                raise Exception("Function \"%s\" has no return type but returns a value." % self.function.name)
+
+            self.line(lines, depth, "return;")
+        else:
+            if node.value is None:
+                raise Exception("Function \"%s\" must return a value." % self.function.name)
+
+            self.line(lines, depth, "return %s;" % self.expression(node.value))
+
+    def emit_break(self, node, lines, depth):
+        loops = [jump for jump in self.jumps if jump[0] == "loop"]
+
+        if not self.jumps:
+            raise Exception("Break outside of a loop or switch.")
+
+        # Breaks leave the innermost loop, even from inside a switch case
+        if not loops or self.jumps[-1][0] == "loop":
+            self.line(lines, depth, "break;")
+        else:
+            if loops[-1][1] is None:
+                loops[-1][1] = "algocompile_break_%d" % next(self.labels)
+
+            self.line(lines, depth, "goto %s;" % loops[-1][1])
+
+    def emit_continue(self, node, lines, depth):
+        if not any(jump[0] == "loop" for jump in self.jumps):
+            raise Exception("Continue outside of a loop.")
+
+        self.line(lines, depth, "continue;")
+
+    def expression(self, node, precedence=0):
+        # Parenthesized only when the surrounding operator binds tighter
+        return self.expressions[type(node)](node, precedence)
+
+    def emit_binary(self, node, precedence):
+        operator = utils.translate_operator(node.operator)
+        own = utils.PRECEDENCE[operator]
+
+        # Operators are left-associative, so "a + b - c" is a chain of left
+        # operands. It is written in one go, long formulas would otherwise
+        # exceed the recursion limit.
+        rights = []
+        while type(node) is ir.Binary and utils.PRECEDENCE[utils.translate_operator(node.operator)] == own:
+            rights.append((utils.translate_operator(node.operator), node.right))
+            node = node.left
+
+        parts = [self.expression(node, own)]
+        for operator, right in reversed(rights):
+            parts.append("%s %s" % (operator, self.expression(right, own + 1)))
+
+        text = " ".join(parts)
+
+        return "(%s)" % text if own < precedence else text
+
+    def emit_unary(self, node, precedence):
+        operand = self.expression(node.operand, utils.UNARY_PRECEDENCE)
+
+        # "-(-x)" must not become "--x"
+        if operand.startswith(node.operator):
+            operand = "(%s)" % operand
+
+        return "%s%s" % (node.operator, operand)
+
+    def emit_name(self, node):
+        if node.text in utils.BOOLEAN_LITERALS:
+            self.features.add("bool")
+
+        return node.text
+
+    def emit_index(self, node):
+        indices = "][".join(map(self.expression, node.indices))
+
+        return "%s[%s]" % (self.expression(node.target, utils.UNARY_PRECEDENCE + 1), indices)
+
+    def emit_call(self, node):
+        return utils.write_call(node.name, list(map(self.expression, node.arguments)), self.options, self.features)
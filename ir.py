@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+# Tree built by the parsers and turned into code by emitter.Emitter, so that
+# passes can rewrite it in between. Names and types are kept as written in
+# the algorithm, translating them is up to the emitter.
+
+class Node(object):
+
+    __slots__ = ()
+
+class Program(Node):
+
+    __slots__ = ("declarations", "effects")
+
+    def __init__(self, declarations=None, effects=None):
+        super().__init__()
+
+        self.declarations = declarations if declarations is not None else []
+        # What each function may change, see passes.resolve_effects()
+        self.effects = effects if effects is not None else {}
+
+class Variables(Node):
+
+    __slots__ = ("names", "var_type")
+
+    def __init__(self, names, var_type):
+        super().__init__()
+
+        self.names = names
+        self.var_type = var_type
+
+class Function(Node):
+
+    __slots__ = ("name", "return_type", "parameters", "changed", "copied", "local_variables", "body", "memoized")
+
+    def __init__(self, name, return_type="", parameters=None, changed=None, copied=None, local_variables=None, body=None, memoized=None):
+        super().__init__()
+
+        self.name = name
+        self.return_type = return_type
+        # Lists of (names, type) pairs
+        self.parameters = parameters or []
+        self.changed = changed or []
+        self.copied = copied or []
+        self.local_variables = local_variables or []
+        self.body = body if body is not None else []
+        # None unless memoized, else a list of (name, low, high) ranges
+        self.memoized = memoized
+
+class MainFunction(Node):
+
+    __slots__ = ("body",)
+
+    def __init__(self, body=None):
+        super().__init__()
+
+        self.body = body if body is not None else []
+
+class Assignment(Node):
+
+    __slots__ = ("target", "value")
+
+    def __init__(self, target, value):
+        super().__init__()
+
+        self.target = target
+        self.value = value
+
+class If(Node):
+
+    __slots__ = ("branches", "otherwise")
+
+    def __init__(self, branches=None, otherwise=None):
+        super().__init__()
+
+        # Lists of (condition, body) pairs, otherwise is the else body if any
+        self.branches = branches or []
+        self.otherwise = otherwise
+
+class While(Node):
+
+    __slots__ = ("condition", "body")
+
+    def __init__(self, condition, body=None):
+        super().__init__()
+
+        self.condition = condition
+        self.body = body if body is not None else []
+
+class DoWhile(Node):
+
+    __slots__ = ("body", "condition")
+
+    def __init__(self, body=None, condition=None):
+        super().__init__()
+
+        self.body = body if body is not None else []
+        self.condition = condition
+
+class For(Node):
+
+    __slots__ = ("variable", "start", "end", "step", "body")
+
+    def __init__(self, variable, start, end, step=None, body=None):
+        super().__init__()
+
+        self.variable = variable
+        self.start = start
+        self.end = end
+        self.step = step
+        self.body = body if body is not None else []
+
+class Switch(Node):
+
+    __slots__ = ("value", "cases")
+
+    def __init__(self, value, cases=None):
+        super().__init__()
+
+        self.value = value
+        # Lists of (value, body) pairs in source order, None is the default case
+        self.cases = cases or []
+
+class Block(Node):
+
+    __slots__ = ("body",)
+
+    def __init__(self, body=None):
+        super().__init__()
+
+        self.body = body if body is not None else []
+
+class Let(Node):
+
+    __slots__ = ("name", "value")
+
+    def __init__(self, name, value):
+        super().__init__()
+
+        # A local computed once, which keeps the value's own type
+        self.name = name
+        self.value = value
+
+class Return(Node):
+
+    __slots__ = ("value",)
+
+    def __init__(self, value=None):
+        super().__init__()
+
+        self.value = value
+
+class Break(Node):
+
+    __slots__ = ()
+
+class Continue(Node):
+
+    __slots__ = ()
+
+class Call(Node):
+
+    __slots__ = ("name", "arguments")
+
+    def __init__(self, name, arguments=None):
+        super().__init__()
+
+        self.name = name
+        self.arguments = arguments or []
+
+class Index(Node):
+
+    __slots__ = ("target", "indices")
+
+    def __init__(self, target, indices):
+        super().__init__()
+
+        # One index per dimension, "m[i][j]" and "m[i, j]" are the same
+        self.target = target
+        self.indices = indices
+
+class Binary(Node):
+
+    __slots__ = ("operator", "left", "right")
+
+    def __init__(self, operator, left, right):
+        super().__init__()
+
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+class Unary(Node):
+
+    __slots__ = ("operator", "operand")
+
+    def __init__(self, operator, operand):
+        super().__init__()
+
+        self.operator = operator
+        self.operand = operand
+
+class Name(Node):
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        super().__init__()
+
+        self.text = text
+
+class Number(Node):
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        super().__init__()
+
+        self.text = text
+
+class String(Node):
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        super().__init__()
+
+        # With its quotes and escapes, as written in the algorithm
+        self.text = text
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import patterns
+
+WHITESPACE = ("space", "newline")
+WORDS = ("identifier", "number")
+
+class Token(object):
+
+    __slots__ = ("kind", "text", "value", "start", "end")
+
+    def __init__(self, kind, text, value, start, end):
+        super().__init__()
+
+        self.kind = kind
+        self.text = text
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return "Token(%s, %r)" % (self.kind, self.text)
+
+def token_at(text, folded, offset):
+    if offset >= len(text):
+        return Token("eof", "", "", len(text), len(text))
+
+    result = patterns.PATTERNS["token"].match(folded, offset)
+
+    kind = result.lastgroup
+    end = result.end()
+    value = result.group()
+
+    if kind == "identifier":
+        if value in patterns.COMPOUND_KEYWORDS:
+            compound = patterns.COMPOUND_KEYWORDS[value].match(folded, end)
+            if compound:
+                end = compound.end()
+                value = " ".join(folded[offset:end].split())
+                return Token("keyword", text[offset:end], value, offset, end)
+
+        if value in patterns.KEYWORDS:
+            kind = "keyword"
+        elif value in patterns.WORD_OPERATORS:
+            kind = "operator"
+
+    return Token(kind, text[offset:end], value, offset, end)
+
+def tokenize(text, folded):
+    tokens = []
+    offset = 0
+
+    while True:
+        token = token_at(text, folded, offset)
+        tokens.append(token)
+
+        if token.kind == "eof":
+            return tokens
+
+        offset = token.end
@@ -2,38 +2,48 @@
 
 class Output(object):
 
-    def __init__(self, indent=0):
+    def __init__(self):
         super().__init__()
 
-        self.indent = indent
-
     def write(self, text):
         print(text)
 
-class PipeOutput(Output):
+class ListOutput(Output):
 
-    def __init__(self, output, indent=0):
-        super().__init__(indent=indent)
+    def __init__(self, nodes):
+        super().__init__()
 
-        self.output = output
+        self.nodes = nodes
 
-    def write(self, text):
-        self.output.write(text)
+    def write(self, node):
+        self.nodes.append(node)
 
-class FileOutput(Output):
+class BodyOutput(Output):
 
-    def __init__(self, file, indent=0):
-        super().__init__(indent=indent)
+    def __init__(self, block):
+        super().__init__()
 
-        self.file = file
+        # Statements go to the block's current body, which changes along the
+        # way for if branches and switch cases
+        self.block = block
 
-    def write(self, text):
-        self.file.write(text)
+    def write(self, node):
+        self.block.body.append(node)
+
+class FormulaOutput(Output):
+
+    def __init__(self, formula):
+        super().__init__()
+
+        self.formula = formula
+
+    def write(self, node):
+        self.formula.add(node)
 
 class VariablesOutput(Output):
 
-    def __init__(self, variables, indent=0, var_type=False):
-        super().__init__(indent=indent)
+    def __init__(self, variables, var_type=False):
+        super().__init__()
 
         self.variables = variables
         self.var_type = var_type
@@ -49,8 +59,8 @@ class VariablesOutput(Output):
 
 class FunctionParametersOutput(Output):
 
-    def __init__(self, function, indent=0, var_type=False):
-        super().__init__(indent=indent)
+    def __init__(self, function, var_type=False):
+        super().__init__()
 
         self.function = function
         self.var_type = var_type
@@ -76,47 +86,59 @@ class FunctionParametersOutput(Output):
 
 class FunctionArgumentOutput(Output):
 
-    def __init__(self, function_call, indent=0):
-        super().__init__(indent=indent)
+    def __init__(self, function_call):
+        super().__init__()
 
         self.function_call = function_call
 
-    def write(self, text):
-        self.function_call.arguments[-1] += text
+    def write(self, node):
+        self.function_call.arguments[-1].append(node)
 
 class AssignmentOutput(Output):
 
-    def __init__(self, assignment, indent=0):
-        super().__init__(indent=indent)
+    def __init__(self, assignment):
+        super().__init__()
 
         self.assignment = assignment
 
-    def write(self, text):
-        self.assignment.rhs += text
+    def write(self, node):
+        # The assigned variable comes first, then the assigned value
+        if self.assignment.lhs is None:
+            self.assignment.lhs = node
+        else:
+            self.assignment.rhs.append(node)
 
 class ConditionalOutput(Output):
 
-    def __init__(self, condition, indent=0):
-        super().__init__(indent=indent)
+    def __init__(self, condition):
+        super().__init__()
 
         self.condition = condition
 
-    def write(self, text):
-        self.condition.condition += text
+    def write(self, node):
+        self.condition.condition.append(node)
+
+class JumpOutput(Output):
+
+    def __init__(self, jump):
+        super().__init__()
+
+        self.jump = jump
+
+    def write(self, node):
+        self.jump.value.append(node)
 
 class ForLoopOutput(Output):
 
-    def __init__(self, for_loop, indent=0):
-        super().__init__(indent=indent)
+    def __init__(self, for_loop):
+        super().__init__()
 
         self.for_loop = for_loop
 
-    def write(self, text):
+    def write(self, node):
         if self.for_loop.increment is not None:
-            self.for_loop.increment += text
+            self.for_loop.increment.append(node)
         elif self.for_loop.end_value is not None:
-            self.for_loop.end_value += text
+            self.for_loop.end_value.append(node)
         elif self.for_loop.start_value is not None:
-            self.for_loop.start_value += text
-        elif self.for_loop.variable is not None:
-            self.for_loop.variable += text
+            self.for_loop.start_value.append(node)
@@ -1,12 +1,48 @@
 #!/usr/bin/env python3
 
-import re
-
+import ir
+import lexer
 import utils
 import outputs
 
+# Built once per distinct list of children, see dispatch()
+DISPATCH_INDEXES = {}
+
+def dispatch_key(token):
+    if token.kind in ["keyword", "symbol", "operator", "assign"]:
+        return token.value
+
+    return token.kind
+
+def dispatch(children, token):
+    key = tuple(children)
+
+    if key not in DISPATCH_INDEXES:
+        # Parsers without prefixes (e.g. legacy ones) are probed at every position
+        fallback = [child for child in children if child.prefixes is None]
+        prefixes = set(prefix for child in children if child.prefixes is not None for prefix in child.prefixes)
+
+        index = {}
+        for prefix in prefixes:
+            index[prefix] = [child for child in children if child.prefixes is None or prefix in child.prefixes]
+
+        DISPATCH_INDEXES[key] = (index, fallback)
+
+    index, fallback = DISPATCH_INDEXES[key]
+
+    return index.get(dispatch_key(token), fallback)
+
+def in_brackets(variable):
+    # Bounds of an array being declared, e.g. "m[n, k"
+    return variable.count("[") > variable.count("]")
+
 class Parser(object):
 
+    # Dispatch keys of the tokens this parser can start on: keyword, symbol or
+    # operator values, or token kinds such as "identifier". None means that
+    # starts_at() has to be probed at every position.
+    prefixes = None
+
     def __init__(self, out_c, out_h):
         super().__init__()
 
@@ -14,7 +50,7 @@ class Parser(object):
         self.out_h = out_h
 
     def starts(text, parent):
-        return -1
+        return -1, None
 
     def children(self):
         return []
@@ -25,6 +61,22 @@ class Parser(object):
     def parse(self, text):
         return 0
 
+    # The driver calls the *_at variants with the shared utils.Source and an
+    # offset into it, built-in parsers then consume whole tokens from
+    # source.token(offset). Parsers that only implement starts/ends/parse on
+    # the remaining text are still supported through these fallbacks, at the
+    # cost of a copy.
+
+    @classmethod
+    def starts_at(cls, source, offset, parent):
+        return cls.starts(source.text[offset:], parent)
+
+    def ends_at(self, source, offset):
+        return self.ends(source.text[offset:])
+
+    def parse_at(self, source, offset):
+        return self.parse(source.text[offset:])
+
     def write_c(self, text):
         self.out_c.write(text)
 
@@ -36,105 +88,109 @@ class FileParser(Parser):
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
-    def starts(text, parent):
+    def starts_at(source, offset, parent):
         return 0, FileParser(parent.out_c, parent.out_h)
 
     def children(self):
         return [GlobalVariablesParser, FunctionDefinitionParser, MainFunctionDefinitionParser]
 
-    def ends(self, text):
-        return 0 if not text else -1
+    def ends_at(self, source, offset):
+        return 0 if offset >= len(source.text) else -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
-        raise Exception("Unexpected character \"%s\" (%d) in file." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in file." % token.text)
 
 class GlobalVariablesParser(Parser):
 
+    prefixes = ("var",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
         self.variables = [""]
         self.var_type = None
 
-    def starts(text, parent):
-        if text[:4].upper() == "VAR:":
-            return 4, GlobalVariablesParser(parent.out_c, parent.out_h)
-        else:
-            return -1, None
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
 
-    def ends(self, text):
+        if token.value == "var":
+            token = source.token(token.end)
+            if token.text == ":":
+                return token.end - offset, GlobalVariablesParser(parent.out_c, parent.out_h)
+
+        return -1, None
+
+    def ends_at(self, source, offset):
         return 0 if self.variables is None else -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == ",":
+        if self.var_type is None and in_brackets(self.variables[-1]) and token.kind not in ["newline", "eof"]:
+            self.variables[-1] += token.text
+
+            return len(token.text)
+
+        if token.text == ",":
             if self.var_type is None:
                 if not self.variables[-1]:
-                    raise Exception("Unexpected character \"%s\" (%d) in global variables." % (char, ord(char)))
+                    raise Exception("Unexpected token \"%s\" in global variables." % token.text)
 
                 self.variables.append("")
             elif self.var_type:
-                self.write_h("%s\n" % utils.indent(self.out_h.indent, utils.write_variables(self.variables, self.var_type)))
+                self.write_h(ir.Variables(self.variables, self.var_type))
                 self.variables = [""]
                 self.var_type = None
             else:
-                raise Exception("Unexpected character \"%s\" (%d) in global variables." % (char, ord(char)))
+                raise Exception("Unexpected token \"%s\" in global variables." % token.text)
 
-            return len(char)
+            return len(token.text)
 
-        if char == ":" and self.var_type is None:
+        if token.text == ":" and self.var_type is None:
             self.var_type = ""
 
-            return len(char)
+            return len(token.text)
 
-        if self.var_type is None and (char == "[" or char == "]" or char in utils.WORD_CHARACTERS):
-            self.variables[-1] += char
+        if self.var_type is None and (token.text == "[" or token.text == "]" or token.kind in lexer.WORDS):
+            self.variables[-1] += token.text
 
-            return len(char)
+            return len(token.text)
 
-        if self.var_type is not None and (char == " " or char in utils.WORD_CHARACTERS):
-            self.var_type += char
+        if self.var_type is not None and (token.kind == "space" or token.kind in lexer.WORDS):
+            self.var_type += token.text
 
-            return len(char)
+            return len(token.text)
 
-        if char == "\n" and self.var_type is not None:
-            self.write_h("%s\n" % utils.indent(self.out_h.indent, utils.write_variables(self.variables, self.var_type)))
+        if token.kind == "newline" and self.var_type is not None:
+            self.write_h(ir.Variables(self.variables, self.var_type))
             self.variables = None
             self.var_type = None
             return 0
 
-        if (char == "\n" or char == " " or char == "\t") and self.var_type is None and not self.variables[-1]:
-            return len(char)
-
-        if self.var_type is None and len(self.variables[0]) == 1 and not self.variables[0]:
-            offset = 0
-
-            while offset < len(text) and (text[offset] == "\n" or text[offset] == " " or text[offset] == "\t"):
-                pass
-
-            if offset > 0:
-                return offset
+        if token.kind in lexer.WHITESPACE and self.var_type is None and not self.variables[-1]:
+            return len(token.text)
 
-        raise Exception("Unexpected character \"%s\" (%d) in global variables definition." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in global variables definition." % token.text)
 
 class VariablesParser(Parser):
 
+    prefixes = ("identifier", "number")
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
         self.variables = [""]
         self.var_type = None
 
-    def starts(text, parent):
-        char = text[0]
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
 
-        if char in utils.WORD_CHARACTERS:
+        if token.kind in lexer.WORDS:
             if type(parent) is FunctionDefinitionParser:
                 out_c = outputs.FunctionParametersOutput(parent)
                 out_h = outputs.FunctionParametersOutput(parent, var_type=True)
@@ -146,34 +202,39 @@ class VariablesParser(Parser):
         else:
             return -1, None
 
-    def ends(self, text):
+    def ends_at(self, source, offset):
         return 0 if self.variables is None else -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
+
+        if self.var_type is None and in_brackets(self.variables[-1]) and token.kind not in ["newline", "eof"]:
+            self.variables[-1] += token.text
+
+            return len(token.text)
 
-        if self.var_type is None and (char == "[" or char == "]" or char in utils.WORD_CHARACTERS):
-            self.variables[-1] += char
+        if self.var_type is None and (token.text == "[" or token.text == "]" or token.kind in lexer.WORDS):
+            self.variables[-1] += token.text
 
-            return len(char)
+            return len(token.text)
 
-        if char == "," and self.var_type is None:
+        if token.text == "," and self.var_type is None:
             self.variables.append("")
 
-            return len(char)
+            return len(token.text)
 
-        if char == ":" and self.var_type is None:
+        if token.text == ":" and self.var_type is None:
             self.var_type = ""
 
-            return len(char)
+            return len(token.text)
 
-        if self.var_type is not None and (char == " " or char in utils.WORD_CHARACTERS):
-            self.var_type += char
+        if self.var_type is not None and (token.kind == "space" or token.kind in lexer.WORDS):
+            self.var_type += token.text
 
-            return len(char)
+            return len(token.text)
 
-        if self.var_type is None and not self.variables[-1] and char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if self.var_type is None and ((not self.variables[-1] and token.kind == "newline") or token.kind == "space"):
+            return len(token.text)
 
         if self.var_type is not None:
             for i, variable in enumerate(self.variables):
@@ -187,43 +248,50 @@ class VariablesParser(Parser):
 
             return 0
 
-        raise Exception("Unexpected character \"%s\" (%d) in variables definition." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in variables definition." % token.text)
 
 class MainFunctionDefinitionParser(Parser):
 
+    prefixes = ("begin",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
-    def starts(text, parent):
-        if re.match(r"^BEGIN\b", text.upper()):
-            child = MainFunctionDefinitionParser(out_c=parent.out_c, out_h=parent.out_h)
-            child.write_c("%s\n" % utils.indent(child.out_c.indent, "int main(int argc, char *argv[]) {"))
-            child.write_h("%s\n" % utils.indent(child.out_h.indent, "int main(int argc, char *argv[]);"))
-            return 5, child
+        self.node = ir.MainFunction()
+        self.body = self.node.body
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.value == "begin":
+            return len(token.text), MainFunctionDefinitionParser(out_c=parent.out_c, out_h=parent.out_h)
         else:
             return -1, None
 
     def children(self):
-        return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, FunctionCallParser, AssignmentParser]
+        return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, JumpStatementParser, FunctionCallParser, AssignmentParser]
 
-    def ends(self, text):
-        if re.match(r"^END\b", text.upper()):
-            self.write_c("%s\n" % utils.indent(self.out_c.indent + 1, "return 0;"))
-            self.write_c("%s\n" % utils.indent(self.out_c.indent, "}"))
-            return 3
+    def ends_at(self, source, offset):
+        token = source.token(offset)
+
+        if token.value == "end":
+            self.write_c(self.node)
+            return len(token.text)
         else:
             return -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
-        raise Exception("Invalid operation starting with character \"%s\" (%d) in main function body." % (char, ord(char)))
+        raise Exception("Invalid operation starting with token \"%s\" in main function body." % token.text)
 
 class FunctionDefinitionParser(Parser):
 
+    prefixes = ("identifier",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
@@ -236,136 +304,165 @@ class FunctionDefinitionParser(Parser):
         self.copied_parameters = None
         self.local_variables = None
         self.local_types = None
+        self.memoized = None
         self.current_parameters = None
 
-    def starts(text, parent):
-        if re.match(r"^\w+\s*\(", text.lower()) and not re.match(r"^(while|for|do|if)\s*\(", text.lower()):
+        self.node = None
+        self.body = None
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.kind == "identifier" and source.next_token(token.end).text == "(":
             return 0, FunctionDefinitionParser(out_c=parent.out_c, out_h=parent.out_h)
         else:
             return -1, None
 
     def children(self):
         if self.func_name is None:
-            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, FunctionCallParser, AssignmentParser]
+            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, JumpStatementParser, FunctionCallParser, AssignmentParser]
         elif (self.variables is not None and self.return_type is None) or (self.local_variables is not None and self.local_variables == [[""]]):
             return [VariablesParser]
         else:
             return []
 
-    def ends(self, text):
-        if self.func_name is None and re.match(r"^END\b", text.upper()):
-            self.write_c("%s\n" % utils.indent(self.out_c.indent, "}"))
-            return 3
+    def ends_at(self, source, offset):
+        token = source.token(offset)
+
+        if self.func_name is None and token.value == "end":
+            self.write_c(self.node)
+            return len(token.text)
         else:
             return -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
         if self.func_name is not None:
-            if self.variables is None and char in utils.WORD_CHARACTERS:
-                self.func_name += char
+            if self.variables is None and token.kind in lexer.WORDS:
+                self.func_name += token.text
 
-                return len(char)
+                return len(token.text)
 
-            if char == "(" and self.variables is None:
+            if token.text == "(" and self.variables is None:
                 self.variables = [[""]]
                 self.var_types = [""]
 
-                return len(char)
+                return len(token.text)
 
-            if char == "," and self.variables is not None and self.return_type is None:
+            if token.text == "," and self.variables is not None and self.return_type is None:
                 self.variables.append([""])
                 self.var_types.append("")
 
-                return len(char)
+                return len(token.text)
 
-            if char == ")" and self.variables is not None and self.return_type is None:
+            if token.text == ")" and self.variables is not None and self.return_type is None:
                 self.return_type = ""
 
-                result = re.match(r"^(\)\s*:)", text.lower())
-                if result:
-                    return result.end(1)
+                following = source.next_token(token.end)
+                if following.text == ":":
+                    return following.end - offset
                 else:
                     self.done_return = True
 
-                    return len(char)
+                    return len(token.text)
 
             if self.return_type is not None and not self.done_return:
-                if char == " " or char in utils.WORD_CHARACTERS:
-                    self.return_type += char
+                if token.kind == "space" or token.kind in lexer.WORDS:
+                    self.return_type += token.text
 
-                    return len(char)
+                    return len(token.text)
                 else:
                     self.done_return = True
 
             if self.return_type is not None and self.done_return and self.current_parameters is None:
+                following = source.next_token(token.end)
+
                 if self.changed_parameters is None:
-                    result = re.match(r"^(changed\s+parameters\s*:)", text.lower())
-                    if result:
+                    if token.value == "memoized" and self.memoized is None:
+                        self.memoized = [""]
+
+                        if following.text == ":":
+                            self.current_parameters = "memoized"
+
+                            return following.end - offset
+
+                        return len(token.text)
+
+                    if token.value == "changed parameters" and following.text == ":":
                         self.changed_parameters = [""]
                         self.current_parameters = "changed"
 
-                        return result.end(1)
+                        return following.end - offset
 
                 elif self.copied_parameters is None:
-                    result = re.match(r"^(copied\s+parameters\s*:)", text.lower())
-                    if result:
+                    if token.value == "copied parameters" and following.text == ":":
                         self.copied_parameters = [""]
                         self.current_parameters = "copied"
 
-                        return result.end(1)
+                        return following.end - offset
 
                 elif self.local_variables is None:
-                    result = re.match(r"^(local\s+variables\s*:)", text.lower())
-                    if result:
+                    if token.value == "local variables" and following.text == ":":
                         self.local_variables = [[""]]
                         self.local_types = [""]
 
                         self.current_parameters = None
 
-                        return result.end(1)
+                        return following.end - offset
+
+            if self.current_parameters == "memoized":
+                if token.text == ",":
+                    self.memoized.append("")
+
+                    return len(token.text)
+                elif token.kind == "newline" and len(self.memoized) > 1 and not self.memoized[-1].strip():
+                    return len(token.text)
+                elif token.kind not in ["newline", "eof"]:
+                    self.memoized[-1] += token.text
+
+                    return len(token.text)
+                else:
+                    self.current_parameters = None
 
             if self.current_parameters == "changed":
-                if char == ",":
+                if token.text == ",":
                     self.changed_parameters.append("")
 
-                    return len(char)
-                elif char in utils.WORD_CHARACTERS:
-                    self.changed_parameters[-1] += char
+                    return len(token.text)
+                elif token.kind in lexer.WORDS:
+                    self.changed_parameters[-1] += token.text
 
-                    return len(char)
-                elif (char == "\n" and not self.changed_parameters[-1]) or char == " " or char == "\t":
-                    return len(char)
+                    return len(token.text)
+                elif (token.kind == "newline" and not self.changed_parameters[-1]) or token.kind == "space":
+                    return len(token.text)
                 else:
                     self.current_parameters = None
 
             if self.current_parameters == "copied":
-                if char == ",":
+                if token.text == ",":
                     self.copied_parameters.append("")
 
-                    return len(char)
-                elif char in utils.WORD_CHARACTERS:
-                    self.copied_parameters[-1] += char
+                    return len(token.text)
+                elif token.kind in lexer.WORDS:
+                    self.copied_parameters[-1] += token.text
 
-                    return len(char)
-                elif (char == "\n" and not self.copied_parameters[-1]) or char == " " or char == "\t":
-                    return len(char)
+                    return len(token.text)
+                elif (token.kind == "newline" and not self.copied_parameters[-1]) or token.kind == "space":
+                    return len(token.text)
                 else:
                     self.current_parameters = None
 
-            if self.current_parameters is None and (char == "\n" or char == " " or char == "\t"):
-                return len(char)
-
-            if re.match(r"^BEGIN\b", text.upper()):
-                return_type = utils.translate_type(self.return_type)
+            if self.current_parameters is None and token.kind in lexer.WHITESPACE:
+                return len(token.text)
 
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "%s %s(%s) {" % (return_type, self.func_name, utils.write_parameters(self.variables, self.var_types, self.changed_parameters, self.copied_parameters))))
-                self.write_h("%s\n" % utils.indent(self.out_h.indent, "%s %s(%s);" % (return_type, self.func_name, utils.write_parameters(self.variables, self.var_types, self.changed_parameters, self.copied_parameters))))
+            if token.value == "begin":
+                parameters = list(zip(self.variables, self.var_types))
+                local_variables = list(zip(self.local_variables or [], self.local_types or []))
+                memoized = [utils.split_memo_range(x) for x in self.memoized if x.strip()] if self.memoized is not None else None
 
-                for i, variables in enumerate(self.local_variables):
-                    var_type = utils.translate_type(self.local_types[i])
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent + 1, utils.write_variables(variables, var_type)))
+                self.node = ir.Function(self.func_name, self.return_type, parameters, self.changed_parameters, self.copied_parameters, local_variables, memoized=memoized)
+                self.body = self.node.body
 
                 self.func_name = None
                 self.variables = None
@@ -375,30 +472,33 @@ class FunctionDefinitionParser(Parser):
                 self.copied_parameters = None
                 self.local_variables = None
                 self.local_types = None
+                self.memoized = None
                 self.current_parameters = None
 
-                return 5
-        elif char == "\n" or char == " " or char == "\t":
-            return len(char)
+                return len(token.text)
+        elif token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
-        raise Exception("Unexpected character \"%s\" (%d) in function definition." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in function definition." % token.text)
 
 class FunctionCallParser(Parser):
 
+    prefixes = ("identifier",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
         self.func_name = ""
         self.arguments = None
 
-    def starts(text, parent):
-        if re.match(r"^\w+\s*\(", text.lower()) and not re.match(r"^(while|for|do|if)\s*\(", text.lower()):
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.kind == "identifier" and source.next_token(token.end).text == "(":
             if type(parent) is FormulaParser:
-                out_c = outputs.PipeOutput(parent.out_c, indent=-1)
-                return 0, FunctionCallParser(out_c, parent.out_h)
+                return 0, FunctionCallParser(outputs.FormulaOutput(parent), parent.out_h)
             else:
-                out_c = outputs.PipeOutput(parent.out_c, indent=parent.out_c.indent + 1)
-                return 0, FunctionCallParser(out_c, parent.out_h)
+                return 0, FunctionCallParser(outputs.BodyOutput(parent), parent.out_h)
         else:
             return -1, None
 
@@ -408,64 +508,67 @@ class FunctionCallParser(Parser):
         else:
             return []
 
-    def ends(self, text):
+    def ends_at(self, source, offset):
         return 0 if self.func_name is None else -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
-        if char == "," and self.arguments is not None:
+        if token.text == "," and self.arguments is not None:
             if not self.arguments[-1]:
-                raise Exception("Unexpected character \"%s\" (%d) in function call." % (char, ord(char)))
+                raise Exception("Unexpected token \"%s\" in function call." % token.text)
 
-            self.arguments.append("")
+            self.arguments.append([])
 
-            return len(char)
+            return len(token.text)
 
-        if char == "(" and self.arguments is None:
-            self.arguments = [""]
+        if token.text == "(" and self.arguments is None:
+            self.arguments = [[]]
 
-            return len(char)
+            return len(token.text)
 
-        if self.arguments is None and char in utils.WORD_CHARACTERS:
-            self.func_name += char
+        if self.arguments is None and token.kind in lexer.WORDS:
+            self.func_name += token.text
 
-            return len(char)
+            return len(token.text)
 
-        if char == ")" and self.arguments is not None:
-            if self.out_c.indent >= 0:
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, utils.write_function(self.func_name, self.arguments)))
-            else:
-                self.write_c(utils.write_function(self.func_name, self.arguments))
+        if token.text == ")" and self.arguments is not None:
+            self.write_c(ir.Call(self.func_name, [argument[0] for argument in self.arguments if argument]))
 
             self.func_name = None
             self.arguments = None
 
-            return len(char)
+            return len(token.text)
 
-        raise Exception("Unexpected character \"%s\" (%d) in function call." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in function call." % token.text)
 
 class FormulaParser(Parser):
 
+    prefixes = ("(", "+", "-", "string", "identifier", "number")
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
-        self.string = None
-        self.escaped = False
+        # Operands and operators not reduced yet, see reduce()
+        self.operands = []
+        self.operators = []
+        self.sign = None
+
         self.parenthesis = False
+        # Indices of the last operand, between brackets
+        self.indices = None
 
-        self.current = False
-        self.operator = False
-        self.empty = True
+        self.glued = False
+        self.expecting = True
         self.ended = False
 
-    def starts(text, parent):
-        char = text[0]
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
 
-        if char in ["(", "\"", "\'", "+", "-"] or char in utils.WORD_CHARACTERS:
+        if token.text in ["(", "+", "-"] or token.kind == "string" or token.kind in lexer.WORDS:
             if type(parent) is FunctionCallParser:
                 return 0, FormulaParser(outputs.FunctionArgumentOutput(parent), parent.out_h)
             elif type(parent) is AssignmentParser:
@@ -474,344 +577,471 @@ class FormulaParser(Parser):
                 return 0, FormulaParser(outputs.ConditionalOutput(parent), parent.out_h)
             elif type(parent) is ForLoopParser:
                 return 0, FormulaParser(outputs.ForLoopOutput(parent), parent.out_h)
+            elif type(parent) is JumpStatementParser:
+                return 0, FormulaParser(outputs.JumpOutput(parent), parent.out_h)
+            elif type(parent) is FormulaParser:
+                return 0, FormulaParser(outputs.FormulaOutput(parent), parent.out_h)
             else:
                 return 0, FormulaParser(parent.out_c, parent.out_h)
         else:
             return -1, None
 
     def children(self):
-        if self.string is None and (not self.current or self.operator or self.empty) and not self.ended:
+        if self.indices is not None:
+            return [FormulaParser] if self.expecting else []
+        elif self.expecting and not self.ended:
+            # The whole parenthesis is one formula, calls included
             if self.parenthesis:
-                return [FunctionCallParser, FormulaParser]
+                return [FormulaParser]
             else:
                 return [FunctionCallParser]
         else:
             return []
 
-    def ends(self, text):
-        return 0 if self.ended else -1
+    def ends_at(self, source, offset):
+        if self.ended:
+            self.reduce(0)
+            self.write_c(self.operands[0])
+            return 0
+        else:
+            return -1
 
-    def parse(self, text):
-        char = text[0]
+    def add(self, node):
+        if self.indices is not None:
+            self.indices.append(node)
+            self.expecting = False
+            return
+
+        if self.sign is not None:
+            node = ir.Unary(self.sign, node)
+            self.sign = None
+
+        self.operands.append(node)
+        self.expecting = False
+        self.glued = False
+
+    def extend(self, text):
+        # Words glued to the previous one (e.g. "a.b") belong to the same operand
+        operand = self.operands[-1]
+        if type(operand) is ir.Unary:
+            operand = operand.operand
+
+        operand.text += text
+
+    def index(self, indices):
+        # "m[i][j]" indexes m twice, "-t[i]" is the opposite of t[i]
+        operand = self.operands[-1]
+        target = operand.operand if type(operand) is ir.Unary else operand
+
+        if type(target) is ir.Index:
+            target.indices += indices
+        elif type(operand) is ir.Unary:
+            operand.operand = ir.Index(target, indices)
+        else:
+            self.operands[-1] = ir.Index(target, indices)
 
-        if self.string is not None:
-            if self.escaped:
-                self.escaped = False
+    def indexable(self):
+        operand = self.operands[-1]
+        if type(operand) is ir.Unary:
+            operand = operand.operand
 
-                if char == "\n":
-                    return len(char)
-                else:
-                    self.write_c("\\")
-            elif char == "\\":
-                self.escaped = True
+        return type(operand) in [ir.Name, ir.Index]
+
+    def reduce(self, precedence):
+        # Operators are left-associative, those binding at least as tight as
+        # the next one are applied first
+        while self.operators and utils.PRECEDENCE[utils.translate_operator(self.operators[-1])] >= precedence:
+            right = self.operands.pop()
+            left = self.operands.pop()
+            self.operands.append(ir.Binary(self.operators.pop(), left, right))
 
-                return len(char)
-            elif char == self.string:
-                self.string = None
-            elif char == "\n":
-                self.write_c("\\n")
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-                return len(char)
+        if self.indices is not None:
+            if token.kind in lexer.WHITESPACE:
+                return len(token.text)
 
-            self.write_c(char)
+            if token.text == "," and not self.expecting:
+                self.expecting = True
 
-            return len(char)
+                return len(token.text)
+
+            if token.text == "]" and not self.expecting:
+                self.index(self.indices)
+                self.indices = None
+
+                return len(token.text)
+            else:
+                raise Exception("Expected closing bracket but got token \"%s\" in formula." % token.text)
 
         if self.parenthesis:
-            if char == ")":
-                self.parenthesis = False
+            if token.kind in lexer.WHITESPACE:
+                return len(token.text)
 
-                self.write_c(char)
+            if token.text == ")" and not self.expecting:
+                self.parenthesis = False
 
-                return len(char)
+                return len(token.text)
             else:
-                raise Exception("Expected closing parenthesis but got character \"%s\" (%d) in formula." % (char, ord(char)))
+                raise Exception("Expected closing parenthesis but got token \"%s\" in formula." % token.text)
 
-        if char == "\"" or char == "'":
-            self.string = char
-            self.operator = False
-            self.empty = False
+        if self.expecting:
+            if token.kind == "string":
+                self.add(ir.String(token.text))
 
-            self.write_c(char)
+                return len(token.text)
 
-            return len(char)
+            if token.kind in lexer.WORDS:
+                self.add(ir.Number(token.text) if token.kind == "number" else ir.Name(token.text))
+                self.glued = True
 
-        if (self.current or self.operator or self.empty) and char in utils.WORD_CHARACTERS:
-            self.current = True
-            self.operator = False
-            self.empty = False
+                return len(token.text)
 
-            self.write_c(char)
+            if self.sign is None and (token.text == "+" or token.text == "-"):
+                self.sign = token.text
 
-            return len(char)
+                return len(token.text)
 
-        if self.current and char == ".":
-            self.write_c(char)
+            if token.text == "(":
+                # The sign, if any, applies to the whole parenthesis
+                self.parenthesis = True
 
-            return len(char)
+                return len(token.text)
 
-        if not self.current and not self.operator and (char == "+" or char == "-"):
-            self.current = True
+            if token.kind in lexer.WHITESPACE:
+                return len(token.text)
 
-            self.write_c(char)
+            raise Exception("Unexpected token \"%s\" in formula." % token.text)
 
-            return len(char)
+        if self.glued and (token.text == "." or token.kind in lexer.WORDS):
+            self.extend(token.text)
 
-        if not self.operator and not self.empty:
-            result = re.match(r"^\s*(\+|-|\*|/|%|={1,3}|≠|!=|<|>|>=|≥|<=|≤|\|{1,2}|&{1,2}|\^|\band\b|\bor\b)", text.lower())
-            if result:
-                self.current = False
-                self.operator = True
+            return len(token.text)
 
-                self.write_c(" %s " % utils.translate_operator(result.group(1)))
+        self.glued = False
 
-                return result.end(1)
+        if token.text == "[" and self.indexable():
+            self.indices = []
+            self.expecting = True
 
-        if (self.operator or self.empty) and char == "(":
-            self.parenthesis = True
-            self.current = False
-            self.operator = False
-            self.empty = False
+            return len(token.text)
 
-            self.write_c(char)
+        following = source.next_token(offset)
+        if following.kind == "operator":
+            self.reduce(utils.PRECEDENCE[utils.translate_operator(following.value)])
+            self.operators.append(following.value)
+            self.expecting = True
 
-            return len(char)
+            return following.end - offset
 
-        if (self.operator or self.empty) and (char == "\n" or char == " " or char == "\t"):
-            self.current = False
+        self.ended = True
+        return 0
 
-            return len(char)
+def skip_indices(source, offset):
+    # Offset right after the brackets of e.g. "m[i][j]", if any
+    depth = 0
+    token = source.token(offset)
 
-        if not self.string and not self.parenthesis:
-            self.current = False
-            self.ended = True
-            return 0
+    while token.text == "[" or depth > 0:
+        if token.kind in ["newline", "eof"]:
+            return offset
 
-        raise Exception("Unexpected character \"%s\" (%d) in formula." % (char, ord(char)))
+        if token.text == "[":
+            depth += 1
+        elif token.text == "]":
+            depth -= 1
+
+        token = source.token(token.end)
+
+    return token.start
 
 class AssignmentParser(Parser):
 
+    prefixes = ("identifier",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
-        self.lhs = ""
+        self.lhs = None
         self.rhs = None
+        self.ended = False
 
-    def starts(text, parent):
-        if re.match(r"^\w+\s*<-", text.lower()):
-            out_c = outputs.PipeOutput(parent.out_c, indent=parent.out_c.indent + 1)
-            return 0, AssignmentParser(out_c, parent.out_h)
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.kind == "identifier" and source.next_token(skip_indices(source, token.end)).kind == "assign":
+            return 0, AssignmentParser(outputs.BodyOutput(parent), parent.out_h)
         else:
             return -1, None
 
     def children(self):
-        if self.rhs is not None and not self.rhs:
+        if self.lhs is None or (self.rhs is not None and not self.rhs):
             return [FormulaParser]
         else:
             return []
 
-    def ends(self, text):
-        return 0 if self.lhs is None else -1
+    def ends_at(self, source, offset):
+        return 0 if self.ended else -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
         if self.rhs is not None and self.rhs:
-            self.write_c("%s\n" % utils.indent(self.out_c.indent, "%s = %s;" % (self.lhs, self.rhs)))
-            self.lhs = None
-            self.rhs = None
+            self.write_c(ir.Assignment(self.lhs, self.rhs[0]))
+            self.ended = True
 
             return 0
 
-        if self.rhs is None:
-            result = re.match(r"^\s*(<-)", text.lower())
-            if result:
-                self.rhs = ""
+        if self.rhs is None and self.lhs is not None:
+            following = source.next_token(offset)
+            if following.kind == "assign":
+                if type(self.lhs) not in [ir.Name, ir.Index]:
+                    raise Exception("Only variables and array elements can be assigned.")
+
+                self.rhs = []
 
-                return result.end(1)
+                return following.end - offset
 
-            if char in utils.WORD_CHARACTERS or char == " ":
-                self.lhs += char
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
-                return len(char)
+        raise Exception("Unexpected token \"%s\" in assignment." % token.text)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+class JumpStatementParser(Parser):
+
+    prefixes = ("return", "break", "continue")
+
+    def __init__(self, out_c, out_h, keyword="return"):
+        super().__init__(out_c, out_h)
 
-        raise Exception("Unexpected character \"%s\" (%d) in assignment." % (char, ord(char)))
+        self.keyword = keyword
+        # Only returns may have a value, on the same line
+        self.value = [] if keyword == "return" else None
+        self.ended = False
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.value in ["return", "break", "continue"]:
+            return len(token.text), JumpStatementParser(outputs.BodyOutput(parent), parent.out_h, keyword=token.value)
+        else:
+            return -1, None
+
+    def children(self):
+        if self.value is not None and not self.value:
+            return [FormulaParser]
+        else:
+            return []
+
+    def ends_at(self, source, offset):
+        return 0 if self.ended else -1
+
+    def parse_at(self, source, offset):
+        token = source.token(offset)
+
+        if token.kind == "space" and self.value is not None and not self.value:
+            return len(token.text)
+
+        if self.keyword == "return":
+            self.write_c(ir.Return(self.value[0] if self.value else None))
+        elif self.keyword == "break":
+            self.write_c(ir.Break())
+        else:
+            self.write_c(ir.Continue())
+
+        self.ended = True
+
+        return 0
 
 class IfConditionParser(Parser):
 
+    prefixes = ("if",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
-        self.condition = ""
+        self.condition = []
         self.else_block = False
 
-    def starts(text, parent):
-        if re.match(r"^if\b", text.lower()):
-            out_c = outputs.PipeOutput(parent.out_c, indent=parent.out_c.indent + 1)
-            return 2, IfConditionParser(out_c=out_c, out_h=parent.out_h)
+        self.node = ir.If()
+        self.body = None
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.value == "if":
+            return len(token.text), IfConditionParser(out_c=outputs.BodyOutput(parent), out_h=parent.out_h)
         else:
             return -1, None
 
     def children(self):
         if self.condition is None:
-            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, FunctionCallParser, AssignmentParser]
+            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, JumpStatementParser, FunctionCallParser, AssignmentParser]
         elif not self.condition:
             return [FormulaParser]
         else:
             return []
 
-    def ends(self, text):
+    def ends_at(self, source, offset):
         if self.condition is None:
-            result = re.match(r"^(end\s+if)\b", text.lower())
-            if result:
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "}"))
-                return result.end(1)
+            token = source.token(offset)
+
+            if token.value == "end if":
+                self.write_c(self.node)
+                return len(token.text)
             else:
                 return -1
         else:
             return -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
         if self.condition is not None:
-            result = re.match(r"^(then)\b", text.lower())
-            if result:
-                if not self.else_block:
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent, "if (%s) {" % self.condition))
-                else:
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent, "} else if (%s) {" % self.condition))
-                    self.else_block = False
+            if token.value == "then":
+                self.body = []
+                self.node.branches.append((self.condition[0], self.body))
 
                 self.condition = None
+                self.else_block = False
 
-                return result.end(1)
+                return len(token.text)
             else:
-                raise Exception("Unexpected character \"%s\" (%d) in if condition." % (char, ord(char)))
+                raise Exception("Unexpected token \"%s\" in if condition." % token.text)
 
-        result = re.match(r"^(else\s+if)\b", text.lower())
-        if result:
-            self.condition = ""
+        if token.value == "else if":
+            self.condition = []
             self.else_block = True
 
-            return result.end(1)
+            return len(token.text)
 
         if not self.else_block:
-            result = re.match(r"^(else)\b", text.lower())
-            if result:
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "} else {"))
+            if token.value == "else":
+                self.body = self.node.otherwise = []
 
                 self.condition = None
 
-                return result.end(1)
+                return len(token.text)
             else:
-                raise Exception("Unexpected character \"%s\" (%d) in if condition." % (char, ord(char)))
+                raise Exception("Unexpected token \"%s\" in if condition." % token.text)
 
-        raise Exception("Unexpected character \"%s\" (%d) in if body." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in if body." % token.text)
 
 class WhileLoopParser(Parser):
 
+    prefixes = ("while",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
-        self.condition = ""
+        self.condition = []
 
-    def starts(text, parent):
-        if re.match(r"^while\b", text.lower()):
-            out_c = outputs.PipeOutput(parent.out_c, indent=parent.out_c.indent + 1)
-            return 5, WhileLoopParser(out_c=out_c, out_h=parent.out_h)
+        self.node = None
+        self.body = None
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.value == "while":
+            return len(token.text), WhileLoopParser(out_c=outputs.BodyOutput(parent), out_h=parent.out_h)
         else:
             return -1, None
 
     def children(self):
         if self.condition is None:
-            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, FunctionCallParser, AssignmentParser]
+            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, JumpStatementParser, FunctionCallParser, AssignmentParser]
         elif not self.condition:
             return [FormulaParser]
         else:
             return []
 
-    def ends(self, text):
+    def ends_at(self, source, offset):
         if self.condition is None:
-            result = re.match(r"^(end\s+while)\b", text.lower())
-            if result:
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "}"))
-                return result.end(1)
+            token = source.token(offset)
+
+            if token.value == "end while":
+                self.write_c(self.node)
+                return len(token.text)
             else:
                 return -1
         else:
             return -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
         if self.condition is not None:
-            self.write_c("%s\n" % utils.indent(self.out_c.indent, "while (%s) {" % self.condition))
+            self.node = ir.While(self.condition[0])
+            self.body = self.node.body
 
             self.condition = None
 
             return 0
 
-        raise Exception("Unexpected character \"%s\" (%d) in while loop body." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in while loop body." % token.text)
 
 class DoWhileLoopParser(Parser):
 
+    prefixes = ("do",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
         self.condition = None
 
-    def starts(text, parent):
-        if re.match(r"^do\b", text.lower()):
-            out_c = outputs.PipeOutput(parent.out_c, indent=parent.out_c.indent + 1)
-            child = DoWhileLoopParser(out_c=out_c, out_h=parent.out_h)
-            child.write_c("%s\n" % utils.indent(child.out_c.indent, "do {"))
-            return 2, child
+        self.node = ir.DoWhile()
+        self.body = self.node.body
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.value == "do":
+            return len(token.text), DoWhileLoopParser(out_c=outputs.BodyOutput(parent), out_h=parent.out_h)
         else:
             return -1, None
 
     def children(self):
         if self.condition is None:
             # Disabled while loops directly inside do-whiles, otherwise there is no way to differentiate the do-while's end and a while's beginning
-            return [IfConditionParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, FunctionCallParser, AssignmentParser]
+            return [IfConditionParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, JumpStatementParser, FunctionCallParser, AssignmentParser]
         elif not self.condition:
             return [FormulaParser]
         else:
             return []
 
-    def ends(self, text):
+    def ends_at(self, source, offset):
         if self.condition is not None and self.condition:
-            self.write_c("%s\n" % utils.indent(self.out_c.indent, "} while (%s);" % self.condition))
+            self.node.condition = self.condition[0]
+            self.write_c(self.node)
             return 0
         else:
             return -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
         if self.condition is None:
-            result = re.match(r"^(while)\b", text.lower())
-            if result:
-                self.condition = ""
+            if token.value == "while":
+                self.condition = []
 
-                return result.end(1)
+                return len(token.text)
 
-        raise Exception("Unexpected character \"%s\" (%d) in for loop body." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in for loop body." % token.text)
 
 class ForLoopParser(Parser):
 
+    prefixes = ("for",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
@@ -820,180 +1050,178 @@ class ForLoopParser(Parser):
         self.end_value = None
         self.increment = None
 
-    def starts(text, parent):
-        if re.match(r"^for\b", text.lower()):
-            out_c = outputs.PipeOutput(parent.out_c, indent=parent.out_c.indent + 1)
-            return 3, ForLoopParser(out_c=out_c, out_h=parent.out_h)
+        self.node = None
+        self.body = None
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.value == "for":
+            return len(token.text), ForLoopParser(out_c=outputs.BodyOutput(parent), out_h=parent.out_h)
         else:
             return -1, None
 
     def children(self):
         if self.variable is None:
-            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, FunctionCallParser, AssignmentParser]
+            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, JumpStatementParser, FunctionCallParser, AssignmentParser]
         elif (self.start_value is not None and not self.start_value) or (self.end_value is not None and not self.end_value) or (self.increment is not None and not self.increment):
             return [FormulaParser]
         else:
             return []
 
-    def ends(self, text):
+    def ends_at(self, source, offset):
         if self.variable is None:
-            result = re.match(r"^(end\s+for)\b", text.lower())
-            if result:
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "}"))
+            token = source.token(offset)
+
+            if token.value == "end for":
+                self.write_c(self.node)
 
-                return result.end(1)
+                return len(token.text)
             else:
                 return -1
         else:
             return -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
         if self.variable is not None and self.start_value is None:
-            if char in utils.WORD_CHARACTERS:
-                self.variable += char
+            if token.kind in lexer.WORDS:
+                self.variable += token.text
 
-                return len(char)
-            else:
-                result = re.match(r"^(<-)", text.lower())
-                if result:
-                    self.start_value = ""
+                return len(token.text)
+            elif token.kind == "assign":
+                self.start_value = []
 
-                    return result.end(1)
-                else:
-                    raise Exception("Unexpected character \"%s\" (%d) in for loop variable definition." % (char, ord(char)))
+                return len(token.text)
+            else:
+                raise Exception("Unexpected token \"%s\" in for loop variable definition." % token.text)
 
         if self.start_value is not None and self.end_value is None:
-            result = re.match(r"^(to)\b", text.lower())
-            if result:
-                self.end_value = ""
+            if token.value == "to":
+                self.end_value = []
 
-                return result.end(1)
+                return len(token.text)
             else:
-                raise Exception("Unexpected character \"%s\" (%d) in for loop initial value definition." % (char, ord(char)))
+                raise Exception("Unexpected token \"%s\" in for loop initial value definition." % token.text)
 
         if self.end_value is not None and self.increment is None:
-            if char == "[":
-                self.increment = ""
+            if token.text == "[":
+                self.increment = []
 
-                return len(char)
-            else:
-                result = re.match(r"^(do)\b", text.lower())
-                if result:
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent, "for (%s = %s; %s <= %s; ++%s) {" % (self.variable, self.start_value, self.variable, self.end_value, self.variable)))
+                return len(token.text)
+            elif token.value == "do":
+                self.node = ir.For(self.variable, self.start_value[0], self.end_value[0])
+                self.body = self.node.body
 
-                    self.variable = None
-                    self.start_value = None
-                    self.end_value = None
-                    self.increment = None
+                self.variable = None
+                self.start_value = None
+                self.end_value = None
+                self.increment = None
 
-                    return result.end(1)
-                else:
-                    raise Exception("Unexpected character \"%s\" (%d) in for loop end value definition." % (char, ord(char)))
+                return len(token.text)
+            else:
+                raise Exception("Unexpected token \"%s\" in for loop end value definition." % token.text)
 
         if self.increment is not None:
-            result = re.match(r"^(\]\s+do)\b", text.lower())
-            if result:
-                if self.increment.strip() != "1":
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent, "for (%s = %s; %s <= %s; %s += %s) {" % (self.variable, self.start_value, self.variable, self.end_value, self.variable, self.increment)))
-                else:
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent, "for (%s = %s; %s <= %s; ++%s) {" % (self.variable, self.start_value, self.variable, self.end_value, self.variable)))
+            following = source.next_token(token.end)
+            if token.text == "]" and source.token(token.end).kind in lexer.WHITESPACE and following.value == "do":
+                self.node = ir.For(self.variable, self.start_value[0], self.end_value[0], self.increment[0] if self.increment else None)
+                self.body = self.node.body
 
                 self.variable = None
                 self.start_value = None
                 self.end_value = None
                 self.increment = None
 
-                return result.end(1)
+                return following.end - offset
             else:
-                raise Exception("Unexpected character \"%s\" (%d) in for loop increment definition." % (char, ord(char)))
+                raise Exception("Unexpected token \"%s\" in for loop increment definition." % token.text)
 
-        raise Exception("Unexpected character \"%s\" (%d) in for loop body." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in for loop body." % token.text)
 
 class SwitchStatementParser(Parser):
 
+    prefixes = ("switch",)
+
     def __init__(self, out_c, out_h):
         super().__init__(out_c, out_h)
 
-        self.condition = ""
-        self.switch = True
-        self.first_case = True
+        self.condition = []
 
-    def starts(text, parent):
-        if re.match(r"^switch\b", text.lower()):
-            out_c = outputs.PipeOutput(parent.out_c, indent=parent.out_c.indent + 1)
-            return 6, SwitchStatementParser(out_c=out_c, out_h=parent.out_h)
+        self.node = None
+        self.body = None
+
+    def starts_at(source, offset, parent):
+        token = source.token(offset)
+
+        if token.value == "switch":
+            return len(token.text), SwitchStatementParser(out_c=outputs.BodyOutput(parent), out_h=parent.out_h)
         else:
             return -1, None
 
     def children(self):
         if self.condition is None:
-            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, FunctionCallParser, AssignmentParser]
+            # Statements only belong to a case, there is none before the first one
+            if self.body is None:
+                return []
+
+            return [IfConditionParser, WhileLoopParser, DoWhileLoopParser, ForLoopParser, SwitchStatementParser, JumpStatementParser, FunctionCallParser, AssignmentParser]
         elif not self.condition:
             return [FormulaParser]
         else:
             return []
 
-    def ends(self, text):
+    def ends_at(self, source, offset):
         if self.condition is None:
-            result = re.match(r"^(end\s+switch)\b", text.lower())
-            if result:
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "}"))
+            token = source.token(offset)
 
-                return result.end(1)
+            if token.value == "end switch":
+                self.write_c(self.node)
+
+                return len(token.text)
             else:
                 return -1
         else:
             return -1
 
-    def parse(self, text):
-        char = text[0]
+    def parse_at(self, source, offset):
+        token = source.token(offset)
 
-        if char == "\n" or char == " " or char == "\t":
-            return len(char)
+        if token.kind in lexer.WHITESPACE:
+            return len(token.text)
 
         if self.condition is not None and self.condition:
-            if self.switch:
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "switch (%s) {" % self.condition))
+            if self.node is None:
+                self.node = ir.Switch(self.condition[0])
 
                 self.condition = None
-                self.switch = False
 
                 return 0
-            elif char == ":":
-                self.write_c("%s\n" % utils.indent(self.out_c.indent, "case %s:" % self.condition))
+            elif token.text == ":":
+                self.body = []
+                self.node.cases.append((self.condition[0], self.body))
 
                 self.condition = None
 
-                return len(char)
+                return len(token.text)
             else:
-                raise Exception("Unexpected character \"%s\" (%d) in switch case." % (char, ord(char)))
+                raise Exception("Unexpected token \"%s\" in switch case." % token.text)
 
         if self.condition is None:
-            result = re.match(r"^(case)\b", text.lower())
-            if result:
-                self.condition = ""
+            if token.value == "case":
+                self.condition = []
 
-                if not self.first_case:
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent + 1, "break;"))
-                else:
-                    self.first_case = False
-
-                return result.end(1)
+                return len(token.text)
             else:
-                result = re.match(r"^(default\s*:)", text.lower())
-                if result:
-                    if not self.first_case:
-                        self.write_c("%s\n" % utils.indent(self.out_c.indent + 1, "break;"))
-                    else:
-                        self.first_case = False
-
-                    self.write_c("%s\n" % utils.indent(self.out_c.indent, "default:"))
+                following = source.next_token(token.end)
+                if token.value == "default" and following.text == ":":
+                    self.body = []
+                    self.node.cases.append((None, self.body))
 
-                    return result.end(1)
+                    return following.end - offset
 
-        raise Exception("Unexpected character \"%s\" (%d) in switch body." % (char, ord(char)))
+        raise Exception("Unexpected token \"%s\" in switch body." % token.text)
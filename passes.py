@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+import itertools
+
+import ir
+import utils
+import patterns
+
+INT_MAX = 2 ** 31 - 1
+
+# Integer operators computed at translation time, with C++ semantics. Those
+# missing (comparisons, "and", "or") are kept since their result is a bool.
+FOLD_MAP = {
+    "+": lambda x, y: x + y,
+    "-": lambda x, y: x - y,
+    "*": lambda x, y: x * y,
+    "/": lambda x, y: divide(x, y),
+    "%": lambda x, y: x - y * divide(x, y),
+    "&": lambda x, y: x & y,
+    "|": lambda x, y: x | y,
+    "^": lambda x, y: x ^ y
+}
+
+def divide(x, y):
+    # Rounded towards zero like in C++, unlike Python's //
+    quotient = abs(x) // abs(y)
+
+    return quotient if (x < 0) == (y < 0) else -quotient
+
+def transform(node, function):
+    # Children are rewritten before their parent, bodies in place. Nodes wait
+    # on an explicit stack, deep nesting and long formulas would otherwise
+    # exceed the recursion limit.
+    result = [node]
+    stack = [(result, 0, None)]
+
+    while stack:
+        holder, key, state = stack.pop()
+        value = get_child(holder, key)
+
+        if state == "tuple":
+            set_child(holder, key, tuple(value))
+            continue
+
+        if state == "node":
+            set_child(holder, key, function(value))
+            continue
+
+        if isinstance(value, tuple):
+            # Rebuilt once its items are, a list in the meantime
+            value = list(value)
+            set_child(holder, key, value)
+            stack.append((holder, key, "tuple"))
+            children = range(len(value))
+        elif isinstance(value, list):
+            children = range(len(value))
+        elif isinstance(value, ir.Node):
+            stack.append((holder, key, "node"))
+            children = value.__slots__
+        else:
+            continue
+
+        stack.extend((value, child, None) for child in reversed(children))
+
+    return result[0]
+
+def get_child(holder, key):
+    return getattr(holder, key) if isinstance(holder, ir.Node) else holder[key]
+
+def set_child(holder, key, value):
+    if isinstance(holder, ir.Node):
+        setattr(holder, key, value)
+    else:
+        holder[key] = value
+
+def walk(node):
+    # Every node below this one, parents first
+    stack = [node]
+
+    while stack:
+        node = stack.pop()
+
+        if isinstance(node, (list, tuple)):
+            stack.extend(reversed(node))
+        elif isinstance(node, ir.Node):
+            yield node
+
+            stack.extend(getattr(node, slot) for slot in reversed(node.__slots__))
+
+def written_names(statements, effects=None):
+    # Variables these statements may change. Variables passed to one of the
+    # algorithm's functions count when it takes them as changed parameters,
+    # along with the global variables it changes, see resolve_effects().
+    # Other functions may change any variable passed to them.
+    names = set()
+
+    for node in walk(statements):
+        if type(node) is ir.Assignment:
+            names.add(base_name(node.target))
+        elif type(node) is ir.For:
+            names.add(node.variable)
+        elif type(node) is ir.Call and utils.function_name(node.name) not in utils.PURE_FUNCTIONS:
+            effect = (effects or {}).get(utils.function_name(node.name))
+            arguments = [x for i, x in enumerate(node.arguments) if effect is None or i in effect["changed"]]
+
+            names.update(base_name(argument) for argument in arguments if type(argument) in [ir.Name, ir.Index])
+
+            if effect is not None:
+                names.update(effect["globals"])
+
+    return names
+
+def declared_names(declarations):
+    # Variable names of (names, type) pairs, without their bounds
+    return [utils.split_array_name(name)[0] for names, var_type in declarations for name in names]
+
+def summarize(function):
+    # What a function may change outside of itself, as JSON-friendly values
+    # since summaries are cached. Its calls to the algorithm's functions are
+    # only resolved along with theirs, see resolve_effects().
+    parameters = declared_names(function.parameters)
+    own = set(parameters + declared_names(function.local_variables))
+
+    calls = [x for x in walk(function.body) if type(x) is ir.Call and not utils.is_builtin(x.name)]
+    callees = set(utils.function_name(x.name) for x in calls)
+
+    # Without what the algorithm's functions change, known once resolved
+    written = written_names(function.body, {name: {"changed": [], "globals": []} for name in callees})
+
+    return {
+        "changed": [i for i, name in enumerate(parameters) if name in function.changed],
+        "globals": sorted(written - own),
+        "io": any(type(x) is ir.Call and utils.function_name(x.name) in utils.FUNC_MAP for x in walk(function.body)),
+        "arguments": [[utils.function_name(x.name), i, base_name(y)] for x in calls for i, y in enumerate(x.arguments) if type(y) in [ir.Name, ir.Index] and base_name(y) not in own],
+        "calls": sorted(callees)
+    }
+
+def summarize_program(program):
+    return {utils.function_name(x.name): summarize(x) for x in program.declarations if type(x) is ir.Function}
+
+def resolve_effects(summaries):
+    # Parameters each function changes, by position, and global variables it
+    # changes or whether it reads or writes, itself or through the functions
+    # it calls
+    effects = {name: {"changed": summary["changed"], "globals": set(summary["globals"]), "io": summary["io"]} for name, summary in summaries.items()}
+
+    for name, summary in summaries.items():
+        for callee, position, argument in summary["arguments"]:
+            if callee not in summaries or position in summaries[callee]["changed"]:
+                effects[name]["globals"].add(argument)
+
+    # Until every call chain is followed to its end
+    changed = True
+    while changed:
+        changed = False
+
+        for name, summary in summaries.items():
+            for callee in summary["calls"]:
+                # Functions defined nowhere are assumed to read or write
+                io = effects[callee]["io"] if callee in effects else True
+
+                if callee in effects and not effects[callee]["globals"] <= effects[name]["globals"]:
+                    effects[name]["globals"] |= effects[callee]["globals"]
+                    changed = True
+
+                if io and not effects[name]["io"]:
+                    effects[name]["io"] = True
+                    changed = True
+
+    return effects
+
+def base_name(node):
+    # The array an element belongs to, e.g. "m" for "m[i][j]"
+    while type(node) is ir.Index:
+        node = node.target
+
+    return node.text
+
+def constant(node):
+    # Octal ("010") and floating point literals are left alone
+    if type(node) is ir.Number and patterns.PATTERNS["integer_literal"].match(node.text):
+        return int(node.text)
+
+    return None
+
+def fits(*values):
+    # Larger literals are long in C++, folding them could change the type
+    # formulas are computed in, and overflowing an int is undefined
+    return all(value is not None and abs(value) <= INT_MAX for value in values)
+
+def fold(node):
+    if type(node) is ir.Unary:
+        value = constant(node.operand)
+        if fits(value):
+            return ir.Number(str(value if node.operator == "+" else -value))
+
+    if type(node) is ir.Binary:
+        left = constant(node.left)
+        right = constant(node.right)
+        operator = utils.translate_operator(node.operator)
+
+        if not fits(left, right) or operator not in FOLD_MAP:
+            return node
+
+        if operator in ["/", "%"] and right == 0:
+            return node
+
+        value = FOLD_MAP[operator](left, right)
+
+        if fits(value):
+            return ir.Number(str(value))
+
+    return node
+
+def fold_constants(program):
+    return transform(program, fold)
+
+def side_effects(node, effects):
+    # Whether computing a formula changes variables, reads or writes
+    if written_names(node, effects):
+        return True
+
+    for call in walk(node):
+        if type(call) is ir.Call:
+            name = utils.function_name(call.name)
+
+            if name in utils.FUNC_MAP or (not utils.is_builtin(name) and (name not in effects or effects[name]["io"])):
+                return True
+
+    return False
+
+def invariant(node, value, effects):
+    # Whether a bound of this loop can be computed once before it: computing
+    # it must have no effect, and neither the loop nor its other bounds may
+    # change what it reads
+    if side_effects(value, effects):
+        return False
+
+    names = set(x.text for x in walk(value) if type(x) is ir.Name)
+    written = written_names([node.start, node.end, node.step, node.body], effects)
+
+    return not names & (written | set([node.variable]))
+
+def hoist(node, counter, effects):
+    if type(node) is not ir.For:
+        return node
+
+    # Literals and variables are cheap to read again, anything else is
+    # computed once before the loop, in a block that scopes its locals,
+    # as long as the loop cannot change it
+    body = []
+    for slot in ["end", "step"]:
+        value = getattr(node, slot)
+
+        if value is not None and type(value) not in [ir.Number, ir.Name] and invariant(node, value, effects):
+            name = "algocompile_%s_%d" % (slot, next(counter))
+            body.append(ir.Let(name, value))
+            setattr(node, slot, ir.Name(name))
+
+    return ir.Block(body + [node]) if body else node
+
+def hoist_loop_bounds(program):
+    counter = itertools.count(1)
+
+    return transform(program, lambda x: hoist(x, counter, program.effects))
+
+# Run in order on every translated program, between parsing and emission
+PASSES = [fold_constants, hoist_loop_bounds]
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import re
+
+# Keywords made of a single word are recognised with a set lookup on the
+# identifier matched by the token pattern, rather than with a regex.
+KEYWORDS = set([
+    "begin", "end", "if", "then", "else", "while", "do", "for", "to",
+    "switch", "case", "default", "var", "return", "break", "continue"
+])
+
+WORD_OPERATORS = set(["and", "or"])
+
+# Keywords spanning several words, keyed on their first word and matched
+# right after it with .match(folded, offset).
+COMPOUND_KEYWORDS = {
+    "end": re.compile(r"\s+(?:if|while|for|switch)\b"),
+    "else": re.compile(r"\s+if\b"),
+    "changed": re.compile(r"\s+parameters\b"),
+    "copied": re.compile(r"\s+parameters\b"),
+    "local": re.compile(r"\s+variables\b")
+}
+
+# Longest operators first so that e.g. "<=" is not read as "<" then "="
+OPERATORS = [
+    "===", "==", "=", "≠", "!=", ">=", "≥", "<=", "≤", "<", ">",
+    "||", "|", "&&", "&", "^", "+", "-", "*", "/", "%"
+]
+
+# Every other pattern, compiled once at import. Apart from "option", which is
+# searched for line by line, none of them is anchored with "^", they are meant
+# to be used with .match(text, offset) on the full buffer.
+PATTERNS = {
+    # Matched against the case-folded text, hence lowercase-only identifiers
+    "token": re.compile("|".join([
+        r"(?P<newline>[ \t]*\n[ \t\n]*)",
+        r"(?P<space>[ \t]+)",
+        r"(?P<string>\"(?:\\[\s\S]|[^\"\\])*\"|'(?:\\[\s\S]|[^'\\])*')",
+        r"(?P<assign><-)",
+        r"(?P<operator>%s)" % "|".join(map(re.escape, OPERATORS)),
+        r"(?P<number>[0-9]+(?:\.[0-9]+)?(?![a-z0-9_]))",
+        r"(?P<identifier>[a-z0-9_]+)",
+        r"(?P<symbol>[\s\S])"
+    ])),
+
+    # Strings are matched too so that a "#" inside them does not start a comment
+    "comment": re.compile(r"\"(?:\\[\s\S]|[^\"\\])*\"?|'(?:\\[\s\S]|[^'\\])*'?|(#[^\n]*)"),
+
+    # A bare END closes a function or the main program, strings are matched
+    # too so that an "end" inside them is skipped
+    "block_end": re.compile(r"\"(?:\\[\s\S]|[^\"\\])*\"|'(?:\\[\s\S]|[^'\\])*'|\b(end)\b(?!\s+(?:if|while|for|switch)\b)"),
+
+    # A VAR: section goes on until the end of a line that does not end with a comma
+    "global_variables": re.compile(r"\s*(var:(?:[^\n]*,[ \t]*\n)*[^\n]*\n?)"),
+
+    # Options set by the algorithm itself, e.g. "# algocompile: fast-io", on
+    # a line of their own and found with .findall(text)
+    "option": re.compile(r"^[ \t]*#[ \t]*algocompile:[ \t]*([a-z0-9_-]+)[ \t]*$", re.M | re.I),
+
+    # Whole arguments of a translated function call, used by the C backend
+    "string_literal": re.compile(r"\"(?:\\[\s\S]|[^\"\\])*\"$"),
+    "char_literal": re.compile(r"'(?:\\[\s\S]|[^'\\])*'$"),
+    "identifier": re.compile(r"[A-Za-z_][A-Za-z0-9_]*$"),
+
+    # Integer literals folded at translation time, see passes.fold()
+    "integer_literal": re.compile(r"-?(?:0|[1-9][0-9]*)$"),
+
+    "line_break": re.compile(r"\n"),
+    "string_escape": re.compile(r"\\[\s\S]|\n"),
+    "array_of": re.compile(r"array\s+of\s+"),
+    "array_bounds": re.compile(r"\[([^\]]*)\]"),
+    "memo_range": re.compile(r"(\w+)\s+from\s+(-?[0-9]+)\s+to\s+(-?[0-9]+)$", re.I),
+    "non_word": re.compile(r"\W+"),
+    "algorithm_file": re.compile(r"(.*)\.alg$"),
+
+    # Failure dumps of a batch are written next to their algorithm
+    "failure_dump": re.compile(r".*_failed(?:_[0-9]+)?\.alg$")
+}
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+
+# C++ helpers written into the generated header when a program needs them,
+# along with the standard headers they depend on.
+
+FAST_IO_HEADERS = ["cstdio", "cctype", "cstdlib", "string", "type_traits", "unistd.h"]
+
+# Buffered replacement for std::cin and std::cout, used by Read and Write
+# when fast I/O is enabled. Output is flushed before waiting for input, so
+# that prompts still show up, once more at exit, and before aborting.
+FAST_IO = """#define ALGOCOMPILE_FAST_IO
+
+namespace algocompile {
+    static char input_buffer[1 << 16];
+    static ssize_t input_length = 0;
+    static ssize_t input_position = 0;
+
+    static char output_buffer[1 << 16];
+    static size_t output_length = 0;
+
+    inline void flush() {
+        fwrite(output_buffer, 1, output_length, stdout);
+        fflush(stdout);
+        output_length = 0;
+    }
+
+    inline int peek() {
+        if (input_position == input_length) {
+            flush();
+
+            input_length = read(0, input_buffer, sizeof(input_buffer));
+            input_position = 0;
+
+            if (input_length <= 0) {
+                input_length = 0;
+                return EOF;
+            }
+        }
+
+        return (unsigned char) input_buffer[input_position];
+    }
+
+    inline int get() {
+        int c = peek();
+
+        if (c != EOF) {
+            ++input_position;
+        }
+
+        return c;
+    }
+
+    inline void skip_spaces() {
+        while (isspace(peek())) {
+            ++input_position;
+        }
+    }
+
+    template<typename T> inline typename std::enable_if<std::is_integral<T>::value>::type read(T &x) {
+        skip_spaces();
+
+        bool negative = peek() == '-';
+        if (negative || peek() == '+') {
+            get();
+        }
+
+        x = 0;
+        while (isdigit(peek())) {
+            x = x * 10 + (get() - '0');
+        }
+
+        if (negative) {
+            x = -x;
+        }
+    }
+
+    inline void read(char &x) {
+        skip_spaces();
+        x = get();
+    }
+
+    inline void read(std::string &x) {
+        skip_spaces();
+
+        x.clear();
+        while (peek() != EOF && !isspace(peek())) {
+            x += (char) get();
+        }
+    }
+
+    inline void read(double &x) {
+        std::string word;
+        read(word);
+        x = strtod(word.c_str(), NULL);
+    }
+
+    inline void put(char c) {
+        if (output_length == sizeof(output_buffer)) {
+            flush();
+        }
+
+        output_buffer[output_length++] = c;
+    }
+
+    template<typename T> inline typename std::enable_if<std::is_integral<T>::value>::type write(T x) {
+        char digits[24];
+        int length = 0;
+
+        unsigned long long value = x < 0 ? -(unsigned long long) x : x;
+        do {
+            digits[length++] = '0' + value % 10;
+            value /= 10;
+        } while (value);
+
+        if (x < 0) {
+            put('-');
+        }
+
+        while (length) {
+            put(digits[--length]);
+        }
+    }
+
+    inline void write(char x) {
+        put(x);
+    }
+
+    inline void write(bool x) {
+        put(x ? '1' : '0');
+    }
+
+    inline void write(const char *x) {
+        while (*x) {
+            put(*x++);
+        }
+    }
+
+    inline void write(const std::string &x) {
+        write(x.c_str());
+    }
+
+    inline void write(double x) {
+        char digits[32];
+        snprintf(digits, sizeof(digits), "%g", x);
+        write(digits);
+    }
+
+    static struct Flusher {
+        ~Flusher() {
+            flush();
+        }
+    } flusher;
+}
+"""
+
+# Storage of "array of" variables, see utils.write_variables(). Elements are
+# contiguous and row-major, indexing goes through views which check bounds
+# only when ALGOCOMPILE_BOUNDS_CHECK is defined (in the dev build profile).
+ARRAYS = """namespace algocompile {
+    inline long check_bounds(long index, long size) {
+#ifdef ALGOCOMPILE_BOUNDS_CHECK
+        if (index < 0 || index >= size) {
+#ifdef ALGOCOMPILE_FAST_IO
+            flush();
+#else
+            fflush(stdout);
+#endif
+            fprintf(stderr, "Index %ld is out of bounds (size %ld).\\n", index, size);
+            abort();
+        }
+#endif
+
+        return index;
+    }
+
+    constexpr long product() {
+        return 1;
+    }
+
+    template<typename... L> constexpr long product(long size, L... sizes) {
+        return size * product(sizes...);
+    }
+
+    template<int D> inline long stride(const long *sizes) {
+        return sizes[1] * stride<D - 1>(sizes + 1);
+    }
+
+    template<> inline long stride<1>(const long *) {
+        return 1;
+    }
+
+    template<typename T, int D> struct view {
+        T *data;
+        const long *sizes;
+
+        view<T, D - 1> operator[](long i) const {
+            return view<T, D - 1>{data + check_bounds(i, sizes[0]) * stride<D>(sizes), sizes + 1};
+        }
+    };
+
+    template<typename T> struct view<T, 1> {
+        T *data;
+        const long *sizes;
+
+        T &operator[](long i) const {
+            return data[check_bounds(i, sizes[0])];
+        }
+    };
+
+    template<typename T, long... N> struct array {
+        static constexpr long sizes[sizeof...(N)] = {N...};
+        T data[product(N...)];
+
+        operator view<T, sizeof...(N)>() {
+            return view<T, sizeof...(N)>{data, sizes};
+        }
+
+        auto operator[](long i) -> decltype(view<T, sizeof...(N)>()[i]) {
+            return view<T, sizeof...(N)>{data, sizes}[i];
+        }
+    };
+
+    template<typename T, long... N> constexpr long array<T, N...>::sizes[sizeof...(N)];
+
+    template<typename T, int D> struct dynamic_array {
+        long sizes[D];
+        T *data;
+
+        template<typename... L> dynamic_array(L... n) : sizes{n...}, data(new T[product(n...)]()) {}
+
+        // A copy of another array's elements, see utils.write_copies()
+        dynamic_array(view<T, D> other) {
+            long size = 1;
+
+            for (int i = 0; i < D; i++) {
+                sizes[i] = other.sizes[i];
+                size *= sizes[i];
+            }
+
+            data = new T[size];
+
+            for (long i = 0; i < size; i++) {
+                data[i] = other.data[i];
+            }
+        }
+
+        ~dynamic_array() {
+            delete[] data;
+        }
+
+        dynamic_array(const dynamic_array &) = delete;
+        dynamic_array &operator=(const dynamic_array &) = delete;
+
+        operator view<T, D>() {
+            return view<T, D>{data, sizes};
+        }
+
+        auto operator[](long i) -> decltype(view<T, D>()[i]) {
+            return view<T, D>{data, sizes}[i];
+        }
+    };
+}
+"""
+
+# Builtin functions of the algorithms, see utils.BUILTIN_MAP. Sort and
+# binary search work on the first n elements of a one-dimensional array.
+SORT = """namespace algocompile {
+    template<typename A> inline void sort(A &&a, long n) {
+        if (n > 0) {
+            check_bounds(n - 1, a.sizes[0]);
+        }
+
+        std::sort(a.data, a.data + n);
+    }
+}
+"""
+
+# Position of the value among the sorted elements, -1 when it is missing
+BINARY_SEARCH = """namespace algocompile {
+    template<typename A, typename T> inline long binary_search(A &&a, long n, const T &x) {
+        if (n > 0) {
+            check_bounds(n - 1, a.sizes[0]);
+        }
+
+        auto end = a.data + n;
+        auto found = std::lower_bound(a.data, end, x);
+
+        return found != end && !(x < *found) ? found - a.data : -1;
+    }
+}
+"""
+
+# Unlike std::min and std::max, arguments may have different types
+MIN_MAX = """namespace algocompile {
+    template<typename A, typename B> inline typename std::common_type<A, B>::type min(A a, B b) {
+        return b < a ? b : a;
+    }
+
+    template<typename A, typename B> inline typename std::common_type<A, B>::type max(A a, B b) {
+        return a < b ? b : a;
+    }
+}
+"""
+
+# Integer power by squaring, std::pow would go through doubles
+POW = """namespace algocompile {
+    inline long pow(long base, long exponent) {
+        if (exponent < 0) {
+            return base == 1 ? 1 : base == -1 ? (exponent % 2 ? -1 : 1) : 0;
+        }
+
+        long result = 1;
+
+        while (exponent > 0) {
+            if (exponent & 1) {
+                result *= base;
+            }
+
+            exponent >>= 1;
+            if (exponent > 0) {
+                base *= base;
+            }
+        }
+
+        return result;
+    }
+}
+"""
+
+# Integer square root rounded down, corrected where doubles lose precision
+SQRT = """namespace algocompile {
+    inline long sqrt(long x) {
+        if (x <= 0) {
+            return 0;
+        }
+
+        long root = (long) std::sqrt((double) x);
+
+        while (root * root > x) {
+            root--;
+        }
+
+        while ((root + 1) * (root + 1) <= x) {
+            root++;
+        }
+
+        return root;
+    }
+}
+"""
+
+# Tables of memoized functions, see emitter.Emitter.emit_memoized(). Calls
+# are counted, and the hit rate is printed at exit when
+# ALGOCOMPILE_MEMO_STATS is defined (in the dev build profile).
+MEMO = """namespace algocompile {
+    struct memo_stats {
+        const char *name;
+        long hits;
+        long misses;
+
+        memo_stats(const char *name) : name(name), hits(0), misses(0) {}
+
+        ~memo_stats() {
+#ifdef ALGOCOMPILE_MEMO_STATS
+            long calls = hits + misses;
+            fprintf(stderr, "Memoized %s: %ld hits out of %ld calls (%.1f%%).\\n", name, hits, calls, calls ? 100.0 * hits / calls : 0.0);
+#endif
+        }
+    };
+
+    template<int I, typename... A> struct tuple_hash {
+        static size_t hash(const std::tuple<A...> &key) {
+            typedef typename std::tuple_element<I - 1, std::tuple<A...>>::type element;
+
+            size_t seed = tuple_hash<I - 1, A...>::hash(key);
+
+            return seed ^ (std::hash<element>()(std::get<I - 1>(key)) + 0x9e3779b9 + (seed << 6) + (seed >> 2));
+        }
+    };
+
+    template<typename... A> struct tuple_hash<0, A...> {
+        static size_t hash(const std::tuple<A...> &) {
+            return 0;
+        }
+    };
+
+    // Any arguments, up to a number of entries after which results are no longer stored
+    template<typename R, typename... A> struct memo {
+        struct hash {
+            size_t operator()(const std::tuple<A...> &key) const {
+                return tuple_hash<sizeof...(A), A...>::hash(key);
+            }
+        };
+
+        std::unordered_map<std::tuple<A...>, R, hash> values;
+        size_t capacity;
+        memo_stats stats;
+
+        memo(const char *name, size_t capacity) : capacity(capacity), stats(name) {}
+
+        const R *find(const A &... args) {
+            auto found = values.find(std::make_tuple(args...));
+
+            if (found == values.end()) {
+                stats.misses++;
+                return nullptr;
+            }
+
+            stats.hits++;
+            return &found->second;
+        }
+
+        R store(R value, const A &... args) {
+            if (values.size() < capacity) {
+                values.emplace(std::make_tuple(args...), value);
+            }
+
+            return value;
+        }
+    };
+
+    // Integer arguments within declared ranges, results are stored in place
+    template<typename R, int D> struct dense_memo {
+        long lows[D];
+        long sizes[D];
+        R *values;
+        bool *known;
+        memo_stats stats;
+
+        dense_memo(const char *name, std::initializer_list<long> lows, std::initializer_list<long> sizes) : stats(name) {
+            long size = 1;
+
+            for (int i = 0; i < D; i++) {
+                this->lows[i] = lows.begin()[i];
+                this->sizes[i] = sizes.begin()[i];
+                size *= this->sizes[i];
+            }
+
+            values = new R[size]();
+            known = new bool[size]();
+        }
+
+        ~dense_memo() {
+            delete[] values;
+            delete[] known;
+        }
+
+        template<typename... A> long index(A... args) const {
+            long keys[D] = {args...};
+            long result = 0;
+
+            for (int i = 0; i < D; i++) {
+                if (keys[i] < lows[i] || keys[i] >= lows[i] + sizes[i]) {
+                    return -1;
+                }
+
+                result = result * sizes[i] + keys[i] - lows[i];
+            }
+
+            return result;
+        }
+
+        template<typename... A> const R *find(A... args) {
+            long i = index(args...);
+
+            if (i < 0 || !known[i]) {
+                stats.misses++;
+                return nullptr;
+            }
+
+            stats.hits++;
+            return &values[i];
+        }
+
+        template<typename... A> R store(R value, A... args) {
+            long i = index(args...);
+
+            if (i >= 0) {
+                values[i] = value;
+                known[i] = true;
+            }
+
+            return value;
+        }
+    };
+}
+"""
+
+# Written to the header after the includes when a feature is used
+FEATURE_CODE = {
+    "array": ARRAYS,
+    "sort": SORT,
+    "binary_search": BINARY_SEARCH,
+    "min_max": MIN_MAX,
+    "pow": POW,
+    "sqrt": SQRT,
+    "memo": MEMO
+}
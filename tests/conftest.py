@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Helpers shared by the tests, which run with either pytest or
+# "python3 -m unittest discover tests" (both put this folder on sys.path)
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import compile
+
+# Tests that build algorithms are skipped when no C++ compiler is installed
+HAS_COMPILER = any(map(shutil.which, ["clang++", "g++", "c++"]))
+
+def translate(text, options=None):
+    # The .cpp body of an algorithm, translated in memory
+    return compile_text(text, options)[0]
+
+def compile_text(text, options=None):
+    out_c = io.StringIO()
+    out_h = io.StringIO()
+
+    stats = compile.compile(io.StringIO(text), out_c, out_h, dump_file=None, options=options)
+
+    return out_c.getvalue(), out_h.getvalue(), stats
+
+class Workspace(object):
+    # A temporary folder with its own cache, where compile.py is run as users do
+
+    def __init__(self):
+        super().__init__()
+
+        self.directory = tempfile.mkdtemp()
+        self.env = dict(os.environ, ALGOCOMPILE_CACHE=os.path.join(self.directory, "cache"))
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, text):
+        with open(self.path(name), "w") as file:
+            file.write(text)
+
+        return self.path(name)
+
+    def run(self, *arguments, input=None):
+        process = subprocess.run([sys.executable, os.path.join(ROOT, "compile.py")] + list(arguments), cwd=self.directory, env=self.env, input=input, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+
+        return process.stdout
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
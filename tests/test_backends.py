@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from conftest import compile_text
+
+import utils
+
+PROGRAM = """VAR: x: integer
+
+BEGIN
+  x <- 0
+  while true
+    x <- x + 1
+    if x > 4 then
+      break
+    end if
+  end while
+  Write(x)
+END
+"""
+
+class CBackendTest(unittest.TestCase):
+
+    def test_boolean_literals(self):
+        options = {"backend": "c"}
+        body_c, body_h, stats = compile_text(PROGRAM, options)
+
+        self.assertIn("while (true) {", body_c)
+        self.assertIn("stdbool.h", utils.find_headers(stats["features"], options))
+
+if __name__ == "__main__":
+    unittest.main()
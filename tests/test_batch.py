@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from conftest import HAS_COMPILER, Workspace
+
+import build
+import compile
+
+@unittest.skipUnless(HAS_COMPILER, "no C++ compiler installed")
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = Workspace()
+
+        for i in range(3):
+            self.workspace.write("program_%d.alg" % i, "BEGIN\n  Write(%d * 11, \"\\n\")\nEND\n" % i)
+
+    def tearDown(self):
+        self.workspace.remove()
+
+    def test_jobs(self):
+        output = self.workspace.run("-j", "2", ".", "run")
+
+        self.assertIn("Processed 3 files (0 failed)", output)
+
+        for i in range(3):
+            self.assertIn("%d\n" % (i * 11), output)
+
+    def test_glob(self):
+        self.workspace.run("-j", "2", ".", "compile")
+
+        files = compile.find_algorithms([self.workspace.path("*")])
+
+        self.assertEqual(files, [self.workspace.path("program_%d.alg" % i) for i in range(3)])
+
+    def test_release_profile(self):
+        output = self.workspace.run("-p", "release", "program_1.alg", "run")
+
+        self.assertIn("release profile", output)
+        self.assertIn("11\n", output)
+
+    def test_unknown_profile(self):
+        output = self.workspace.run("-p", "fastest", "program_1.alg", "compile")
+
+        self.assertIn("Unknown build profile fastest", output)
+
+class ProfilesTest(unittest.TestCase):
+
+    def test_profile_flags(self):
+        profiles = build.load_profiles([])
+
+        self.assertIn("-DALGOCOMPILE_BOUNDS_CHECK", profiles["dev"]["flags"])
+        self.assertIn("-O2", profiles["release"]["flags"])
+
+    def test_config_file(self):
+        workspace = Workspace()
+        path = workspace.write("algocompile.ini", "[release]\nflags = -O3 -DNDEBUG\n\n[small]\nflags = -Os\n")
+
+        try:
+            profiles = build.load_profiles([path])
+        finally:
+            workspace.remove()
+
+        self.assertEqual(profiles["release"]["flags"], ["-O3", "-DNDEBUG"])
+        self.assertEqual(profiles["small"]["flags"], ["-Os"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+from conftest import HAS_COMPILER, Workspace
+
+PROGRAM = """square(n: integer): integer
+Changed parameters: x
+Copied parameters: n
+Local variables: x: integer
+BEGIN
+  return n * n
+END
+
+VAR: x: integer
+
+BEGIN
+  x <- square(%d)
+  Write(x, "\\n")
+END
+"""
+
+@unittest.skipUnless(HAS_COMPILER, "no C++ compiler installed")
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = Workspace()
+
+    def tearDown(self):
+        self.workspace.remove()
+
+    def test_cache_hit(self):
+        self.workspace.write("square.alg", PROGRAM % 7)
+
+        first = self.workspace.run("square.alg", "run")
+        second = self.workspace.run("square.alg", "run")
+
+        self.assertIn("cache miss", first)
+        self.assertIn("49\n", first)
+        self.assertIn("Cache hits: 2, misses: 0", second)
+        self.assertIn("49\n", second)
+
+    def test_changed_block(self):
+        self.workspace.write("square.alg", PROGRAM % 7)
+        self.workspace.run("square.alg", "parse")
+
+        self.workspace.write("square.alg", PROGRAM % 8)
+        output = self.workspace.run("square.alg", "run")
+
+        self.assertIn("1 of 3 blocks translated", output)
+        self.assertIn("64\n", output)
+
+    def test_precompiled_header(self):
+        self.workspace.write("seven.alg", PROGRAM % 7)
+        self.workspace.write("eight.alg", PROGRAM % 8)
+
+        first = self.workspace.run("seven.alg", "compile")
+        second = self.workspace.run("eight.alg", "compile")
+
+        self.assertIn("a header precompiled in", first)
+        self.assertIn("and a precompiled header", second)
+
+    def test_no_cache(self):
+        self.workspace.write("square.alg", PROGRAM % 7)
+        output = self.workspace.run("--no-cache", "square.alg", "run")
+
+        self.assertIn("49\n", output)
+        self.assertFalse(os.path.exists(self.workspace.path("cache")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from conftest import translate
+
+def nested_blocks(depth):
+    lines = ["VAR: x, i: integer", "BEGIN", "x <- 0"]
+    ends = []
+
+    for level in range(depth):
+        if level % 3 == 0:
+            lines.append("if x >= 0 then")
+            ends.append("end if")
+        elif level % 3 == 1:
+            lines.append("while x < %d" % (level + 1))
+            ends.append("end while")
+        else:
+            lines.append("for i <- 1 to 1 do")
+            ends.append("end for")
+
+        lines.append("x <- x + 1")
+
+    lines += reversed(ends)
+    lines += ["Write(x)", "END", ""]
+
+    return "\n".join(lines)
+
+def long_formula(terms):
+    formula = " + ".join(["x"] * terms)
+
+    return "VAR: x: integer\nBEGIN\nx <- %s\nif %s > 0 then\nWrite(%s)\nend if\nEND\n" % (formula, formula, formula)
+
+class NestingTest(unittest.TestCase):
+
+    def test_nested_blocks(self):
+        output = translate(nested_blocks(1000))
+
+        self.assertEqual(output.count("if (x >= 0) {"), 334)
+        self.assertEqual(output.count("while ("), 333)
+        self.assertEqual(output.count("for (i = 1; i <= 1; ++i) {"), 333)
+        self.assertEqual(output.count("x = x + 1;"), 1000)
+
+    def test_long_formula(self):
+        output = translate(long_formula(20000))
+
+        self.assertEqual(output.count(" + x"), 3 * 19999)
+        self.assertIn("if (x + x + x", output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+
+from conftest import Workspace, translate
+
+import cache
+import compile
+
+PROGRAM = """VAR: t[3]: array of integer
+
+%s(a[3]: array of integer)
+Changed parameters: %s
+Copied parameters: %s
+Local variables: i, x: integer
+BEGIN
+  for i <- 0 to 2 do
+    a[i] <- 0
+  end for
+END
+
+BEGIN
+  t[0] <- 7
+  %s(t)
+  Write(t[0])
+END
+"""
+
+CALLS = """count(s: string, n: integer): integer
+Changed parameters: x
+Copied parameters: s, n
+Local variables: x: integer
+BEGIN
+  if n = 0 then
+    return 0
+  end if
+  return 1 + count(s, n - 1)
+END
+
+fill(t[4]: array of integer)
+Changed parameters: t
+Copied parameters: x
+Local variables: i, x: integer
+BEGIN
+  for i <- 0 to 3 do
+    t[i] <- 1
+  end for
+END
+
+total(t[4]: array of integer, s: string): integer
+Changed parameters: x
+Copied parameters: t, s
+Local variables: x: integer
+BEGIN
+  return t[0] + count(s, 2)
+END
+
+twice(t[4]: array of integer, s: string): integer
+Changed parameters: x
+Copied parameters: t, s
+Local variables: x: integer
+BEGIN
+  fill(t)
+  return total(t, s) * 2
+END
+
+BEGIN
+END
+"""
+
+class ParametersTest(unittest.TestCase):
+
+    def test_copied_array(self):
+        output = translate(PROGRAM % ("clear", "x", "a", "clear"))
+
+        self.assertIn("void clear(algocompile::view<int, 1> algocompile_copied_a) {", output)
+        self.assertIn("algocompile::dynamic_array<int, 1> a(algocompile_copied_a);", output)
+
+    def test_written_array(self):
+        # Copied or not, parameters are passed by value unless changed
+        output = translate(PROGRAM % ("clear", "x", "x", "clear"))
+
+        self.assertIn("algocompile::dynamic_array<int, 1> a(algocompile_copied_a);", output)
+
+    def test_changed_array(self):
+        output = translate(PROGRAM % ("reset", "a", "x", "reset"))
+
+        self.assertIn("void reset(algocompile::view<int, 1> a) {", output)
+        self.assertNotIn("algocompile_copied_a", output)
+
+    def test_passed_on(self):
+        output = translate(CALLS)
+
+        # Only parameters the function called changes count as written
+        self.assertIn("int count(const std::string &s, int n) {", output)
+        self.assertIn("int total(algocompile::view<int, 1> t, const std::string &s) {", output)
+        self.assertIn("int twice(algocompile::view<int, 1> algocompile_copied_t, const std::string &s) {", output)
+
+    def test_passed_on_blocks(self):
+        workspace = Workspace()
+        store = cache.Cache(workspace.path("cache"))
+
+        try:
+            # Once with every block translated, then with their summaries cached
+            for i in range(2):
+                out_c = io.StringIO()
+                compile.compile_blocks(io.StringIO(CALLS), out_c, io.StringIO(), store, dump_file=None)
+
+                self.assertEqual(out_c.getvalue(), translate(CALLS))
+        finally:
+            workspace.remove()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from conftest import translate
+
+LOOP = """VAR: i, n: integer
+
+BEGIN
+  n <- 3
+  for i <- 1 to n - 1 do
+    %s
+  end for
+END
+"""
+
+CALLS = """half(v: integer): integer
+Changed parameters: x
+Copied parameters: v
+Local variables: x: integer
+BEGIN
+  return v / 2
+END
+
+bump(v: integer): integer
+Changed parameters: x
+Copied parameters: v
+Local variables: x: integer
+BEGIN
+  %s <- %s + 1
+  return v
+END
+
+loud(v: integer): integer
+Changed parameters: x
+Copied parameters: v
+Local variables: x: integer
+BEGIN
+  Write(v)
+  return v
+END
+
+VAR: i, n, m: integer
+
+BEGIN
+  n <- 10
+  for i <- %s to %s do
+    %s
+  end for
+END
+"""
+
+class HoistTest(unittest.TestCase):
+
+    def loop(self, variable, start, end, statement="Write(bump(i))"):
+        output = translate(CALLS % (variable, variable, start, end, statement))
+
+        return [line.strip() for line in output.splitlines() if "for (" in line or "const auto" in line]
+
+    def test_invariant_bound(self):
+        output = translate(LOOP % "Write(i)")
+
+        self.assertIn("const auto algocompile_end_1 = n - 1;", output)
+        self.assertIn("for (i = 1; i <= algocompile_end_1; ++i) {", output)
+
+    def test_written_bound(self):
+        output = translate(LOOP % "n <- 2")
+
+        self.assertIn("for (i = 1; i <= n - 1; ++i) {", output)
+        self.assertNotIn("algocompile_end", output)
+
+    def test_pure_function(self):
+        self.assertEqual(self.loop("m", "1", "half(n)"), ["const auto algocompile_end_1 = half(n);", "for (i = 1; i <= algocompile_end_1; ++i) {"])
+
+    def test_changed_global(self):
+        self.assertEqual(self.loop("n", "1", "half(n)"), ["for (i = 1; i <= half(n); ++i) {"])
+
+    def test_output(self):
+        self.assertEqual(self.loop("m", "1", "loud(n)"), ["for (i = 1; i <= loud(n); ++i) {"])
+
+    def test_start(self):
+        self.assertEqual(self.loop("n", "1", "n * 2", "Write(i)"), ["const auto algocompile_end_1 = n * 2;", "for (i = 1; i <= algocompile_end_1; ++i) {"])
+        self.assertEqual(self.loop("n", "bump(1)", "n * 2", "Write(i)"), ["for (i = bump(1); i <= n * 2; ++i) {"])
+
+class FoldTest(unittest.TestCase):
+
+    def fold(self, formula):
+        output = translate("VAR: x: integer\nBEGIN\nx <- %s\nEND\n" % formula)
+
+        return next(line.strip() for line in output.splitlines() if line.strip().startswith("x = "))
+
+    def test_constants(self):
+        self.assertEqual(self.fold("(6 / 2) * 7 - -3"), "x = 24;")
+
+    def test_long_operands(self):
+        self.assertEqual(self.fold("(5000000000 / 5) * 3"), "x = 5000000000 / 5 * 3;")
+
+    def test_overflow(self):
+        self.assertEqual(self.fold("2147483647 + 1"), "x = 2147483647 + 1;")
+        self.assertEqual(self.fold("(1 + 2) * 1073741824"), "x = 3 * 1073741824;")
+
+if __name__ == "__main__":
+    unittest.main()
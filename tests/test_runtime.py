@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from conftest import HAS_COMPILER, Workspace
+
+SUM = """VAR: i, n, x, total: integer, word: string
+
+BEGIN
+  Read(n)
+  total <- 0
+  for i <- 1 to n do
+    Read(x)
+    total <- total + x
+  end for
+  Read(word)
+  Write(total, " ", word, "\\n")
+END
+"""
+
+BUILTINS = """VAR: t[6]: array of integer,
+     a, b: integer
+
+BEGIN
+  t[0] <- 5
+  t[1] <- -2
+  t[2] <- 9
+  t[3] <- 0
+  t[4] <- 7
+  t[5] <- 3
+  sort(t, 6)
+  Write(t[0], " ", t[5], " ", binary_search(t, 6, 7), " ", binary_search(t, 6, 4), "\\n")
+  a <- 4
+  b <- 11
+  swap(a, b)
+  Write(a, " ", b, " ", min(a, b), " ", max(a, b), " ", abs(-6), "\\n")
+  Write(pow(3, 13), " ", sqrt(99), " ", sqrt(100), "\\n")
+END
+"""
+
+JUMPS = """find(n: integer): integer
+Changed parameters: x
+Copied parameters: n
+Local variables: i, x: integer
+BEGIN
+  for i <- 1 to 100 do
+    if i * i >= n then
+      return i
+    end if
+  end for
+  return -1
+END
+
+VAR: i, total: integer
+
+BEGIN
+  total <- 0
+  for i <- 1 to 10 do
+    if i % 2 = 0 then
+      continue
+    end if
+    if i > 7 then
+      break
+    end if
+    total <- total + i
+  end for
+  Write(total, " ", find(50), "\\n")
+END
+"""
+
+MEMO = """fib(n: integer): integer
+Memoized
+Changed parameters: x
+Copied parameters: n
+Local variables: x: integer
+BEGIN
+  if n < 2 then
+    return n
+  end if
+  return fib(n - 1) + fib(n - 2)
+END
+
+paths(n, k: integer): integer
+Memoized: n from 0 to 30, k from 0 to 30
+Changed parameters: x
+Copied parameters: n, k
+Local variables: x: integer
+BEGIN
+  if n = 0 or k = 0 then
+    return 1
+  end if
+  return paths(n - 1, k) + paths(n, k - 1)
+END
+
+BEGIN
+  Write(fib(40), " ", paths(16, 16), "\\n")
+END
+"""
+
+PARAMETERS = """VAR: t[3]: array of integer,
+     s: string
+
+clear(a[3]: array of integer, w: string)
+Changed parameters: x
+Copied parameters: x
+Local variables: i, x: integer
+BEGIN
+  for i <- 0 to 2 do
+    a[i] <- 0
+  end for
+  w <- "changed"
+  Write(a[0], " ", w, " ")
+END
+
+BEGIN
+  t[0] <- 7
+  s <- "kept"
+  clear(t, s)
+  Write(t[0], " ", s, "\\n")
+END
+"""
+
+@unittest.skipUnless(HAS_COMPILER, "no C++ compiler installed")
+class RuntimeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = Workspace()
+
+    def tearDown(self):
+        self.workspace.remove()
+
+    def run_algorithm(self, text, *arguments, input=None):
+        self.workspace.write("algorithm.alg", text)
+
+        return self.workspace.run(*(arguments + ("algorithm.alg", "run")), input=input)
+
+    def test_fast_io(self):
+        values = list(range(-500, 1500, 7))
+        input = "%d\n%s\nend\n" % (len(values), " ".join(map(str, values)))
+
+        expected = "%d end\n" % sum(values)
+
+        self.assertIn(expected, self.run_algorithm(SUM, input=input))
+        self.assertIn(expected, self.run_algorithm(SUM, "--fast-io", input=input))
+
+    def test_parameters(self):
+        self.assertIn("0 changed 7 kept\n", self.run_algorithm(PARAMETERS))
+
+    def test_builtins(self):
+        output = self.run_algorithm(BUILTINS)
+
+        self.assertIn("-2 9 4 -1\n", output)
+        self.assertIn("11 4 4 11 6\n", output)
+        self.assertIn("1594323 9 10\n", output)
+
+    def test_jumps(self):
+        self.assertIn("16 8\n", self.run_algorithm(JUMPS))
+
+    def test_memoized(self):
+        output = self.run_algorithm(MEMO)
+
+        self.assertIn("102334155 601080390\n", output)
+        self.assertIn("Memoized fib: 38 hits out of 79 calls", output)
+
+if __name__ == "__main__":
+    unittest.main()
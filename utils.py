@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
-import re
+import bisect
+
+import lexer
+import patterns
+
+VERSION = "1.1.0"
 
 INDENT_UNIT = "    " # "\t"
 
@@ -8,6 +13,7 @@ WORD_CHARACTERS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ01234
 
 TYPE_MAP = {
     "integer": "int",
+    "string": "std::string",
     "": "void"
 }
 
@@ -16,7 +22,97 @@ FUNC_MAP = {
     "write": lambda x: "std::cout << %s;" % " << ".join(x)
 }
 
+# Builtin functions, called in formulas as well as on their own. Those not
+# from the standard library are written to the header, see runtime.SORT.
+BUILTIN_MAP = {
+    "sort": "algocompile::sort",
+    "binary_search": "algocompile::binary_search",
+    "min": "algocompile::min",
+    "max": "algocompile::max",
+    "pow": "algocompile::pow",
+    "sqrt": "algocompile::sqrt",
+    "abs": "std::abs",
+    "swap": "std::swap"
+}
+
+# Functions that never change their arguments, see passes.written_names()
+PURE_FUNCTIONS = set(["write", "binary_search", "min", "max", "pow", "sqrt", "abs"])
+
+# Operators FUNC_MAP puts between the arguments of these functions
+FUNC_OPERATORS = {
+    "read": ">>",
+    "write": "<<"
+}
+
+# Replaces FUNC_MAP entries when the "fast_io" option is set, see runtime.FAST_IO
+FAST_IO_FUNC_MAP = {
+    "read": lambda x: " ".join(map(lambda y: "algocompile::read(%s);" % y, x)),
+    "write": lambda x: " ".join(map(lambda y: "algocompile::write(%s);" % y, x))
+}
+
+# Runtime features recorded while translating, each one brings its headers.
+# Operators and string literals need none, a literal is a plain char array.
+TYPE_FEATURES = {
+    "string": ["string"]
+}
+
+FUNC_FEATURES = {
+    "read": ["io"],
+    "write": ["io"],
+    "sort": ["array", "sort"],
+    "binary_search": ["array", "binary_search"],
+    "min": ["min_max"],
+    "max": ["min_max"],
+    "pow": ["pow"],
+    "sqrt": ["math", "sqrt"],
+    "abs": ["abs"],
+    "swap": ["swap"]
+}
+
+FEATURE_HEADERS = {
+    "abs": ["cstdlib"],
+    "array": ["cstdio", "cstdlib"],
+    "binary_search": ["algorithm"],
+    "io": ["iostream"],
+    "math": ["cmath"],
+    "memo": ["cstdio", "functional", "initializer_list", "tuple", "unordered_map"],
+    "min_max": ["type_traits"],
+    "sort": ["algorithm"],
+    "string": ["string"],
+    "swap": ["utility"]
+}
+
+# Used instead of TYPE_MAP, FUNC_MAP and FEATURE_HEADERS when the "backend"
+# option is "c". Types missing from C_TYPE_MAP have no C equivalent.
+C_TYPE_MAP = {
+    "integer": "int",
+    "": "void"
+}
+
+C_FUNC_MAP = {
+    "read": lambda x: "scanf(\"%s\", %s);" % ("%d" * len(x), ", ".join(map(lambda y: "&%s" % y, x))),
+    "write": lambda x: "printf(%s);" % ", ".join([write_format(x)] + list(filter(lambda y: not patterns.PATTERNS["string_literal"].match(y), x)))
+}
+
+C_FEATURE_HEADERS = {
+    "bool": ["stdbool.h"],
+    "io": ["stdio.h"],
+    "math": ["math.h"]
+}
+
+# Names that need the "bool" feature, C has them in stdbool.h only
+BOOLEAN_LITERALS = ["true", "false"]
+
+# Types passed by const reference rather than copied, unless they are written to
+REFERENCE_TYPES = ["string"]
+
+# Entries of a memoized function's table, dense tables over declared ranges
+# are used up to MEMO_DENSE_LIMIT entries, hash tables keep MEMO_CAPACITY
+MEMO_DENSE_LIMIT = 1 << 24
+MEMO_CAPACITY = 1 << 20
+
 OP_MAP = {
+    "===": "==",
     "=": "==",
     "≠": "!=",
     "≥": ">=",
@@ -25,84 +121,350 @@ OP_MAP = {
     "or": "||"
 }
 
+# C++ precedence of the translated operators, higher binds tighter. Formulas
+# keep the meaning they had when they were copied as is to the C++ file.
+PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    "|": 3,
+    "^": 4,
+    "&": 5,
+    "==": 6, "!=": 6,
+    "<": 7, "<=": 7, ">": 7, ">=": 7,
+    "<<": 8, ">>": 8,
+    "+": 9, "-": 9,
+    "*": 10, "/": 10, "%": 10
+}
+
+UNARY_PRECEDENCE = 11
+
+class LineMap(object):
+
+    def __init__(self, text, chunks):
+        super().__init__()
+
+        # Offsets in the stripped text where each kept chunk starts, and the
+        # offsets in the original text these chunks were copied from
+        self.starts = [chunk[0] for chunk in chunks]
+        self.origins = [chunk[1] for chunk in chunks]
+
+        self.lines = [0] + [result.end() for result in patterns.PATTERNS["line_break"].finditer(text)]
+
+    def original(self, offset):
+        i = bisect.bisect_right(self.starts, offset) - 1
+        if i < 0:
+            return offset
+
+        return self.origins[i] + offset - self.starts[i]
+
+    def locate(self, offset):
+        original = self.original(offset)
+        line = bisect.bisect_right(self.lines, original)
+
+        return line, original - self.lines[line - 1] + 1
+
 def strip_comments(text):
+    chunks = []
+    stripped_text = []
+    stripped_length = 0
     offset = 0
 
-    stripped_text = ""
-    string = None
+    for result in patterns.PATTERNS["comment"].finditer(text):
+        if result.group(1) is None:
+            continue
+
+        chunks.append((stripped_length, offset))
+        stripped_text.append(text[offset:result.start()])
+        stripped_length += result.start() - offset
+        offset = result.end()
+
+    chunks.append((stripped_length, offset))
+    stripped_text.append(text[offset:])
+
+    return "".join(stripped_text), LineMap(text, chunks)
 
-    while offset < len(text):
-        char = text[offset]
+class Source(object):
 
-        if char == "\"" or char == "'":
-            if string is None:
-                string = char
-            elif char == string:
-                string = None
+    def __init__(self, text, line_map=None, options=None):
+        super().__init__()
 
-        if string is None:
-            result = re.match(r"^(#.*)\n", text[offset:])
-            if char == "#":
-                offset += result.end(1)
-                continue
+        self.text = text
+        self.line_map = line_map
+        self.options = options or {}
 
-        stripped_text += char
-        offset += len(char)
+        # Runtime features used by the translated code, see utils.FEATURE_HEADERS
+        self.features = set()
+        self.folded = fold_case(text)
+
+        self.tokens = lexer.tokenize(self.text, self.folded)
+        self.index = {token.start: token for token in self.tokens}
+
+    def token(self, offset):
+        token = self.index.get(offset)
+
+        # Legacy parsers may stop in the middle of a token, lex from there
+        if token is None:
+            token = lexer.token_at(self.text, self.folded, offset)
+            self.index[offset] = token
+
+        return token
+
+    def next_token(self, offset):
+        token = self.token(offset)
+
+        while token.kind in lexer.WHITESPACE:
+            token = self.token(token.end)
+
+        return token
+
+def fold_case(text):
+    folded = text.lower()
+
+    # Lowering may expand some characters (e.g. "İ"), which would shift every
+    # following offset; keep those as-is so both buffers stay aligned.
+    if len(folded) != len(text):
+        folded = "".join(map(lambda x: x.lower() if len(x.lower()) == 1 else x, text))
+
+    return folded
 
-    return stripped_text
 
 def indent(count, text=""):
     return "\n".join(map(lambda x: INDENT_UNIT * count + x, text.split("\n")))
 
-def translate_type(var_type):
+def is_c(options):
+    return options is not None and options.get("backend") == "c"
+
+def split_array_type(var_type):
+    # "array of array of integer" has two dimensions of integers
     var_type = var_type.strip().lower()
+    depth = 0
+
+    result = patterns.PATTERNS["array_of"].match(var_type)
+    while result:
+        depth += 1
+        var_type = var_type[result.end():]
+        result = patterns.PATTERNS["array_of"].match(var_type)
+
+    return depth, var_type
 
-    result = re.match(r"^(array\s+of\s+)", var_type)
-    if result:
-        var_type = var_type[result.end(1):]
+def split_array_name(variable):
+    # "m[3][4]" and "m[3, 4]" both have bounds 3 and 4, "m[][]" has two unknown bounds
+    name = patterns.PATTERNS["non_word"].sub(r"", variable.split("[")[0])
+    bounds = [bound.strip() for result in patterns.PATTERNS["array_bounds"].finditer(variable) for bound in result.group(1).split(",")]
 
-    var_type = re.sub(r"\W+", r"", var_type)
+    return name, bounds
+
+def split_memo_range(text):
+    # "n from 0 to 90" is (n, 0, 90)
+    result = patterns.PATTERNS["memo_range"].match(text.strip())
+    if not result:
+        raise Exception("Invalid memoized range \"%s\"." % text.strip())
+
+    low, high = int(result.group(2)), int(result.group(3))
+    if high < low:
+        raise Exception("Invalid memoized range \"%s\"." % text.strip())
+
+    return result.group(1), low, high
+
+def type_name(var_type):
+    return patterns.PATTERNS["non_word"].sub(r"", split_array_type(var_type)[1])
+
+def function_name(func_name):
+    return patterns.PATTERNS["non_word"].sub(r"", func_name).lower()
+
+def is_builtin(func_name):
+    return function_name(func_name) in FUNC_MAP or function_name(func_name) in BUILTIN_MAP
+
+def translate_type(var_type, options=None, features=None):
+    var_type = type_name(var_type)
+
+    if features is not None:
+        features.update(TYPE_FEATURES.get(var_type, []))
+
+    if is_c(options):
+        # C type names written as is (e.g. "int") are kept too
+        if var_type not in C_TYPE_MAP and var_type not in C_TYPE_MAP.values():
+            raise Exception("Type \"%s\" is not supported by the C backend." % var_type)
+
+        return C_TYPE_MAP.get(var_type, var_type)
 
     if var_type in TYPE_MAP:
         var_type = TYPE_MAP[var_type]
 
     return var_type
 
-def write_variables(variables, var_type):
-    var_type = translate_type(var_type)
+def write_variables(variables, var_type, options=None, features=None, local=False):
+    depth = split_array_type(var_type)[0]
+
+    var_type = translate_type(var_type, options, features)
     if var_type in TYPE_MAP:
         var_type = TYPE_MAP[var_type]
 
-    var_names = ", ".join(map(lambda x: re.sub(r"\W+", r"", x), variables))
+    var_names = []
+    arrays = []
+
+    for variable in variables:
+        name, bounds = split_array_name(variable)
+
+        if not bounds and not depth:
+            var_names.append(name)
+        else:
+            arrays.append(write_array(name, bounds, var_type, options, features, local))
+
+    declarations = ["%s %s;" % (var_type, ", ".join(var_names))] if var_names else []
 
-    return "%s %s;" % (var_type, var_names)
+    return "\n".join(declarations + arrays)
 
-def write_parameters(variables, var_types, changed, copied):
+def write_array(name, bounds, var_type, options=None, features=None, local=False):
+    if is_c(options):
+        raise Exception("Arrays are not supported by the C backend.")
+
+    if not bounds or not all(bounds):
+        raise Exception("Array \"%s\" has no bounds." % name)
+
+    if features is not None:
+        features.add("array")
+
+    # Numbers are known at compile time, the elements are then stored in place
+    if all(map(patterns.PATTERNS["integer_literal"].match, bounds)):
+        return "algocompile::array<%s, %s> %s;" % (var_type, ", ".join(bounds), name)
+
+    if not local:
+        raise Exception("Bounds of global array \"%s\" must be numbers." % name)
+
+    return "algocompile::dynamic_array<%s, %d> %s(%s);" % (var_type, len(bounds), name, ", ".join(bounds))
+
+def write_parameters(variables, var_types, changed, options=None, features=None, written=()):
     result = ""
 
+    if changed and is_c(options):
+        raise Exception("Changed parameters are not supported by the C backend.")
+
     for i, var_list in enumerate(variables):
-        var_type = translate_type(var_types[i])
+        depth = split_array_type(var_types[i])[0]
+        var_type = translate_type(var_types[i], options, features)
+        large = type_name(var_types[i]) in REFERENCE_TYPES
 
         for variable in var_list:
             if result:
                 result += ", "
 
-            if variable in changed:
-                result += "%s *%s" % (var_type, variable)
+            variable, bounds = split_array_name(variable)
+
+            # Parameters are passed by value unless they are changed, those the
+            # function does not write to need no copy though. Arrays are passed
+            # as views on the caller's elements, and copied in the function
+            # when it writes to them, see write_copies()
+            if bounds or depth:
+                if is_c(options):
+                    raise Exception("Arrays are not supported by the C backend.")
+
+                if features is not None:
+                    features.add("array")
+
+                if is_array_copy(variable, changed, written):
+                    variable = "algocompile_copied_%s" % variable
+
+                result += "algocompile::view<%s, %d> %s" % (var_type, len(bounds) or depth, variable)
+            elif variable in changed:
+                result += "%s &%s" % (var_type, variable)
+            elif large and variable not in written:
+                result += "const %s &%s" % (var_type, variable)
             else:
                 result += "%s %s" % (var_type, variable)
 
     return result
 
-def write_function(func_name, arguments):
-    func_name = re.sub(r"\W+", r"", func_name).lower()
+def is_array_copy(variable, changed, written):
+    return variable not in changed and variable in written
+
+def write_copies(variables, var_types, changed, options=None, features=None, written=()):
+    # Declarations of the copies of array parameters, first in the function
+    result = []
+
+    for i, var_list in enumerate(variables):
+        depth = split_array_type(var_types[i])[0]
+
+        for variable in var_list:
+            variable, bounds = split_array_name(variable)
+
+            if (bounds or depth) and is_array_copy(variable, changed, written):
+                var_type = translate_type(var_types[i], options, features)
+                result.append("algocompile::dynamic_array<%s, %d> %s(algocompile_copied_%s);" % (var_type, len(bounds) or depth, variable, variable))
+
+    return result
+
+def write_includes(headers):
+    return "".join(map(lambda x: "#include <%s>\n" % x, headers))
+
+def find_headers(features, options=None):
+    feature_headers = C_FEATURE_HEADERS if is_c(options) else FEATURE_HEADERS
+
+    return sorted(set(header for feature in features for header in feature_headers.get(feature, [])))
+
+def write_function(func_name, arguments, options=None, features=None):
+    func_name = function_name(func_name)
+
+    if features is not None:
+        features.update(FUNC_FEATURES.get(func_name, []))
+
+    if is_c(options) and func_name in C_FUNC_MAP:
+        if func_name == "read" and not all(map(patterns.PATTERNS["identifier"].match, arguments)):
+            raise Exception("Read(%s) is not supported by the C backend." % ", ".join(arguments))
+
+        return C_FUNC_MAP[func_name](arguments)
+
+    if options and options.get("fast_io") and func_name in FAST_IO_FUNC_MAP:
+        return FAST_IO_FUNC_MAP[func_name](arguments)
 
     if func_name in FUNC_MAP:
         return FUNC_MAP[func_name](arguments)
 
+    return "%s;" % write_call(func_name, arguments, options, features)
+
+def argument_precedence(func_name, options=None):
+    # Arguments of std::cin and std::cout are operands of >> and <<
+    func_name = function_name(func_name)
+
+    if func_name in FUNC_OPERATORS and not is_c(options) and not (options and options.get("fast_io")):
+        return PRECEDENCE[FUNC_OPERATORS[func_name]] + 1
+
+    return 0
+
+def write_call(func_name, arguments, options=None, features=None):
+    # Calls inside formulas, where their value is used
+    func_name = function_name(func_name)
+
+    if features is not None:
+        features.update(FUNC_FEATURES.get(func_name, []))
+
+    if func_name in BUILTIN_MAP:
+        if is_c(options):
+            raise Exception("Function \"%s\" is not supported by the C backend." % func_name)
+
+        func_name = BUILTIN_MAP[func_name]
+
     arg_name = ", ".join(arguments)
 
-    return "%s(%s);" % (func_name, arg_name)
+    return "%s(%s)" % (func_name, arg_name)
+
+def write_format(arguments):
+    # Every value written is an integer, except for literals
+    format = ""
+
+    for argument in arguments:
+        if patterns.PATTERNS["string_literal"].match(argument):
+            format += argument[1:-1].replace("%", "%%")
+        elif patterns.PATTERNS["char_literal"].match(argument):
+            format += "%c"
+        else:
+            format += "%d"
+
+    return "\"%s\"" % format
+
+def translate_string(string):
+    # Escaped line breaks continue the string, raw ones become escape sequences
+    return patterns.PATTERNS["string_escape"].sub(lambda x: "" if x.group() == "\\\n" else "\\n" if x.group() == "\n" else x.group(), string)
 
 def translate_operator(operator):
     if operator in OP_MAP: